@@ -0,0 +1,85 @@
+"""Benchmark opening a Zipped Album with serial and parallel metadata reading.
+
+Creates a synthetic album with 100 FLAC tracks (valid metadata blocks, random
+audio payload) and measures the time until the tracklist is available, with
+the persistent metadata index disabled.
+
+Usage:
+
+    python benchmarks/album_open.py [--tracks N] [--size MB] [--deflated]
+
+"""
+
+import os
+import sys
+import time
+import struct
+import zipfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from zap import album
+
+
+def make_flac(nr, seconds=180, sample_rate=44100, payload_size=1024 ** 2,
+              date="2001"):
+    streaminfo = bytearray(34)
+    streaminfo[0:4] = struct.pack(">HH", 4096, 4096)
+    total_samples = seconds * sample_rate
+    streaminfo[10:18] = ((sample_rate << 44) | (1 << 41) | (15 << 36) |
+                         total_samples).to_bytes(8, "big")
+    comments = [f"TITLE=Track {nr}", "ARTIST=Artist", "ALBUM=Album",
+                f"DATE={date}", f"TRACKNUMBER={nr}"]
+    vorbis_comment = struct.pack("<I", 4) + b"test" + \
+        struct.pack("<I", len(comments))
+    for comment in comments:
+        vorbis_comment += struct.pack("<I", len(comment)) + comment.encode()
+    data = b"fLaC"
+    data += bytes([0]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+    data += bytes([0x84]) + len(vorbis_comment).to_bytes(3, "big") + \
+        vorbis_comment
+    data += bytes([0xFF, 0xF8]) + os.urandom(payload_size)
+    return data
+
+def make_album(filename, nr_tracks, payload_size, compression):
+    with zipfile.ZipFile(filename, "w", compression=compression) as archive:
+        for nr in range(1, nr_tracks + 1):
+            archive.writestr(f"{nr:03} Track {nr}.flac",
+                             make_flac(nr, payload_size=payload_size))
+
+def time_open(filename, workers, repeats=3):
+    album.METADATA_INDEX = False
+    album.METADATA_WORKERS = workers
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        zipped_album = album.ZippedAlbum(filename)
+        zipped_album.tracklist
+        times.append(time.perf_counter() - start)
+        del zipped_album
+    return min(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=100)
+    parser.add_argument("--size", type=float, default=1.0,
+                        help="audio payload per track in MB")
+    parser.add_argument("--deflated", action="store_true",
+                        help="compress the audio members")
+    args = parser.parse_args()
+
+    compression = zipfile.ZIP_DEFLATED if args.deflated else \
+        zipfile.ZIP_STORED
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "benchmark.zlbm")
+        make_album(filename, args.tracks, int(args.size * 1024 ** 2),
+                   compression)
+        serial = time_open(filename, workers=1)
+        parallel = time_open(filename, workers=0)
+    print(f"{args.tracks} tracks, {args.size} MB each, "
+          f"{'deflated' if args.deflated else 'stored'}")
+    print(f"Serial:   {serial * 1000:8.1f} ms")
+    print(f"Parallel: {parallel * 1000:8.1f} ms ({serial / parallel:.1f}x)")
@@ -0,0 +1,71 @@
+"""Benchmark determining the year(s) of a large compilation.
+
+Creates a synthetic album with 500 FLAC tracks whose date tags use a mix of
+common (YYYY, YYYY-MM-DD) and less common forms, and measures
+`ZippedAlbum.year` (with track metadata already read), once with the fast
+date parser and once with dateutil only.
+
+Usage:
+
+    python benchmarks/album_year.py [--tracks N]
+
+"""
+
+import os
+import sys
+import time
+import zipfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import dateutil.parser
+
+from zap import album
+from album_open import make_flac
+
+
+DATES = ("1987", "1992-03-17", "2001-11", "1979-06-30T12:00:00",
+         "May 1995")
+
+
+def make_album(filename, nr_tracks):
+    with zipfile.ZipFile(filename, "w") as archive:
+        for nr in range(1, nr_tracks + 1):
+            archive.writestr(f"{nr:03} Track {nr}.flac",
+                             make_flac(nr, payload_size=1024,
+                                       date=DATES[nr % len(DATES)]))
+
+def time_year(zipped_album, repeats=5):
+    times = []
+    for _ in range(repeats):
+        if hasattr(zipped_album, "_year"):
+            del zipped_album._year
+        start = time.perf_counter()
+        year = zipped_album.year
+        times.append(time.perf_counter() - start)
+    return min(times), year
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=500)
+    args = parser.parse_args()
+
+    album.METADATA_INDEX = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "benchmark.zlbm")
+        make_album(filename, args.tracks)
+        zipped_album = album.ZippedAlbum(filename)
+        zipped_album.tracks
+        fast, year = time_year(zipped_album)
+        parse_year = album.parse_year
+        album.parse_year = lambda x: dateutil.parser.parse(x).year
+        try:
+            slow, _ = time_year(zipped_album)
+        finally:
+            album.parse_year = parse_year
+    print(f"{args.tracks} tracks, year: {year}")
+    print(f"Fast parser: {fast * 1000:8.2f} ms")
+    print(f"dateutil:    {slow * 1000:8.2f} ms ({slow / fast:.1f}x)")
@@ -0,0 +1,94 @@
+"""Benchmark the time until ZAP is interactive.
+
+Starts ZAP with `--import-profile` and a synthetic album (10 FLAC tracks) a
+few times, and reads the startup report: the time to the first window and
+the time until the album can be played. The app is closed as soon as the
+report has been printed. This needs a display.
+
+To compare with an older revision, check it out into a separate worktree and
+pass its path with `--tree` (trees from before the audio engine was started in
+the background do not report the time to interactive; for them the last
+startup event is used, as they only became responsive after it):
+
+    git worktree add /tmp/zap-before <revision>
+    python benchmarks/startup.py --tree /tmp/zap-before
+    python benchmarks/startup.py
+
+Usage:
+
+    python benchmarks/startup.py [--runs N] [--tree PATH]
+
+"""
+
+import os
+import re
+import sys
+import zipfile
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from album_open import make_album
+
+
+def run_once(tree, filename, timeout=60):
+    with open(os.path.join(tree, "zap", "profiling.py")) as f:
+        reports_interactive = "Time to interactive" in f.read()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "zap", "--import-profile", filename], cwd=tree,
+        stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
+    events = {}
+    first_window = interactive = None
+    in_events = False
+    try:
+        for line in process.stderr:
+            line = line.rstrip()
+            if line == "Startup events:":
+                in_events = True
+                continue
+            match = re.match(r"\s+([\d.]+) ms  (.+)$", line)
+            if in_events and match:
+                events[match.group(2)] = float(match.group(1)) / 1000
+                continue
+            in_events = False
+            match = re.match(r"Time to first window: ([\d.]+) s", line)
+            if match:
+                first_window = float(match.group(1))
+                if not reports_interactive:
+                    break
+            match = re.match(r"Time to interactive: ([\d.]+) s", line)
+            if match:
+                interactive = float(match.group(1))
+                break
+    finally:
+        process.kill()
+        process.wait(timeout)
+    if interactive is None and events:
+        interactive = max(events.values())
+    return first_window, interactive
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tree", default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), ".."))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "benchmark.zlbm")
+        make_album(filename, 10, 1024 ** 2, zipfile.ZIP_STORED)
+        results = [run_once(os.path.abspath(args.tree), filename)
+                   for _ in range(args.runs)]
+    first_window = [x[0] for x in results if x[0] is not None]
+    interactive = [x[1] for x in results if x[1] is not None]
+    print(f"{os.path.abspath(args.tree)}, {args.runs} runs (median)")
+    if first_window:
+        print(f"First window: {statistics.median(first_window) * 1000:8.1f} "
+              "ms")
+    if interactive:
+        print(f"Interactive:  {statistics.median(interactive) * 1000:8.1f} "
+              "ms")
@@ -1,4 +1,10 @@
+import sys
+
+
 def run():
+    if "--import-profile" in sys.argv:
+        from . import profiling
+        profiling.start()
     from .zap import run as run_zap
     run_zap()
 
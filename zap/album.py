@@ -2,34 +2,29 @@ import os
 import io
 import re
 import glob
+import json
+import atexit
 import base64
+import hashlib
+import functools
 import urllib
 import struct
+import weakref
 import zipfile
 import tempfile
 import datetime
-import dateutil.parser
-import multiprocessing
+import threading
+import unicodedata
+import collections
+import concurrent.futures
 import xml.etree.ElementTree as ET
 
-try:
-    import mutagen
-except ImportError:
-    mutagen = None
-    try:
-        import tinytag
-    except ImportError:
-        tinytag = None
-        try:
-            import audio_metadata
-        except ImportError:
-            audio_metadata = None
-
-import fitz
 from PIL import Image
 from PIL import __version__ as pil_version
 
 from .__init__ import __author__, __version__
+from .cache import DiskCache
+from .utils import parse_year
 
 
 FILETYPES = {"tracks": [".flac", ".opus"],
@@ -48,6 +43,59 @@ FIX_TRACKNUMBERS = True # True: skip leading zeros in tracknumber tag and
                         #        tracks without tracknumber tag
 FIX_DATE = True         # True: try "year" tag if no "date" tag is found
                         # False: don't try "year" tag if no "date" tag is found
+METADATA_INDEX = True   # True: keep track metadata in a persistent index
+                        # False: always read track metadata from the album
+METADATA_INDEX_SIZE = 32 * 1024 ** 2  # maximal size of the index (in bytes)
+METADATA_WORKERS = 1    # number of threads reading track metadata in parallel
+                        # (0: automatic, 1: read tracks one after another)
+RENDER_WORKERS = 0      # number of processes rendering booklet pages
+                        # (0: number of CPUs)
+RENDER_DOCUMENTS = 2    # number of booklets kept open by each render process
+RENDER_WINDOW = 40      # number of booklet pages around the current slide
+                        # that are kept rendered (0: render all pages)
+SLIDE_CACHE = True      # True: keep rendered booklet pages in a persistent cache
+                        # False: always render booklet pages when opening album
+SLIDE_CACHE_SIZE = 512 * 1024 ** 2  # maximal size of the cache (in bytes)
+
+IMAGE_CACHE_SIZE = 256 * 1024 ** 2  # maximal memory used for decoded slide
+                                    # images (in bytes)
+SLIDE_SIZES = (256, 768, 1440, 2160)  # sizes (longest edge) slides are
+                                      # prepared in (the largest is used for
+                                      # rendering booklet pages)
+
+_METADATA_INDEX_VERSION = 2
+_ALT_ENCODINGS = ("utf_8", "cp1252", "latin_1", "cp850", "cp1250", "cp1251",
+                  "mac_roman", "shift_jis", "gbk", "big5", "euc_kr")
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+_booklet_documents = collections.OrderedDict()  # per render process
+
+class _Picture:
+    """An embedded picture whose data is only read when first accessed."""
+
+    def __init__(self, type=3, mime="", desc="", width=0, height=0,
+                 offset=None, length=None, data=None, loader=None):
+        self.type = type
+        self.mime = mime
+        self.desc = desc
+        self.width = width
+        self.height = height
+        self.offset = offset  # position of the data in the track file
+        self.length = length
+        self.loader = loader
+        self._data = data
+
+    @property
+    def data(self):
+        if self._data is None and self.loader is not None:
+            try:
+                self._data = self.loader()
+            except Exception:
+                self._data = b""
+            self.loader = None
+        return self._data
+
 
 def _get_content(files):
     content = {"tracks": [],
@@ -61,7 +109,84 @@ def _get_content(files):
                     content[types].append(file)
     return content
 
-def _read_ogg_page(f):
+class _StoredMember(io.RawIOBase):
+    """A read-only file object for the data of a stored ZIP member.
+
+    Unlike `zipfile.ZipExtFile`, seeking does not read through the data, as
+    the member is read directly from the album file.
+
+    """
+
+    def __init__(self, filename, info):
+        self._filename = os.path.abspath(filename)
+        self._file = open(filename, "rb")
+        try:
+            self._offset = _get_data_offset(self._file, info)
+        except Exception:
+            self._file.close()
+            raise
+        self._size = info.file_size
+        self._pos = 0
+        self.name = info.filename
+
+    @property
+    def byte_range(self):
+        return (self._filename, self._offset, self._size)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError("invalid whence")
+        self._pos = max(0, min(pos, self._size))
+        return self._pos
+
+    def readinto(self, b):
+        n = min(len(b), self._size - self._pos)
+        if n <= 0:
+            return 0
+        self._file.seek(self._offset + self._pos)
+        n = self._file.readinto(memoryview(b)[:n])
+        self._pos += n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _get_data_offset(f, info):
+    # Skip the local file header, which can differ from the central directory
+    f.seek(info.header_offset)
+    header = f.read(30)
+    if len(header) < 30 or header[:4] != b"PK\x03\x04":
+        raise zipfile.BadZipFile("Bad magic number for file header")
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    return info.header_offset + 30 + name_length + extra_length
+
+def _open_member(filename, archive, member):
+    info = archive.getinfo(member)
+    if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+        try:
+            return _StoredMember(filename, info)
+        except Exception:
+            pass
+    return archive.open(info)
+
+def _read_ogg_page_header(f):
     # Read the Ogg page header (27 bytes)
     header = f.read(27)
     if len(header) < 27:
@@ -84,53 +209,76 @@ def _read_ogg_page(f):
     if len(segment_table) < page_segments:
         return None  # End of file or error
 
-    # Read the segment data
-    segment_sizes = [seg for seg in segment_table]
-    body_size = sum(segment_sizes)
-    body = f.read(body_size)
-
-    return {'header': header, 'body': body, 'serial_number': serial_number,
+    return {'header': header, 'serial_number': serial_number,
             'granule_position': granule_position, 'header_type': header_type,
             'page_sequence_no': page_sequence_no,
-            'page_segments': page_segments}
+            'page_segments': page_segments, 'segment_table': segment_table,
+            'body_size': sum(segment_table)}
+
+def _read_ogg_page(f):
+    page = _read_ogg_page_header(f)
+    if page is None:
+        return None  # End of file or error
+
+    # Read the segment data
+    page['body'] = f.read(page['body_size'])
+
+    return page
 
-def _get_opus_stream_size(f):
+def _get_opus_stream_size(f, size=None):
     f.seek(0)
     header_count = 0
     serial = None
-    size = 0
-    last_page_size = None
-    eos = False
+    header_size = 0
 
-    while True:
+    # Read pages until both Opus header pages (identification and comment
+    # header) are found
+    while header_count < 2:
         page = _read_ogg_page(f)
         if page is None:
-            break  # End of file or error
-        # Read pages until first Opus header page (identification header)
-        elif header_count == 0: # Identification header
-            if page['body'][:8] != b'OpusHead':  # Page from other stream?
-                continue
-            else:  # Found it
+            raise ValueError("Not a valid Opus file")
+        elif header_count == 0:  # Identification header
+            if page['body'][:8] == b'OpusHead':  # Otherwise other stream
                 serial = page['serial_number']
                 header_count += 1
-        # Check for expected second Opus header page (comment header)
-        elif header_count == 1 and page['serial_number'] == serial:
+        elif page['serial_number'] == serial:  # Comment header
             if page['body'][:8] != b'OpusTags':
                 raise ValueError("Not a valid Opus file")
-            else:
-                header_count += 1
-        # Read pages until first page with audio data
-        elif header_count == 2 and page['serial_number'] == serial:
-            if int.from_bytes(page['header_type'], 'little') & 0x01:
-                continue  # Contiunation of second Opus header page
-            elif page['granule_position'] > 0:  # Found it
-                header_count += 1
-                last_page_size = len(page['body'])
-                size += last_page_size
-        # Read remaining pages with audio data
-        elif page['granule_position'] > 0 and page['serial_number'] == serial:
-            last_page_size = len(page['body'])
-            size += last_page_size
+            header_count += 1
+        header_size = f.tell()
+
+    # Seeking through a compressed member would decompress all of it, so
+    # estimate the page overhead from the first audio page instead
+    if isinstance(f, zipfile.ZipExtFile):
+        if size is None:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(header_size)
+        while True:
+            page = _read_ogg_page_header(f)
+            if page is None:
+                raise ValueError("Not a valid Opus file")
+            if page['serial_number'] == serial and \
+                    page['granule_position'] > 0:
+                break
+            f.seek(page['body_size'], os.SEEK_CUR)
+        page_size = 27 + page['page_segments'] + page['body_size']
+        return int((size - header_size) * page['body_size'] / page_size)
+
+    # Otherwise only read the page headers and seek over the page bodies
+    stream_size = 0
+    last_page_size = 0
+    eos = False
+    while True:
+        page = _read_ogg_page_header(f)
+        if page is None:
+            break  # End of file or error
+        f.seek(page['body_size'], os.SEEK_CUR)
+        # Count pages with audio data (continuation pages of the comment
+        # header have no granule position)
+        if page['granule_position'] > 0 and page['serial_number'] == serial:
+            last_page_size = page['body_size']
+            stream_size += last_page_size
             # If page is last page (end of stream), we are done
             if int.from_bytes(page['header_type'], 'little') & 0x04:
                 eos = True
@@ -138,9 +286,34 @@ def _get_opus_stream_size(f):
 
     # If last page did not contain "end of stream" flag, it was incomplete
     if not eos:
-        size -= last_page_size
+        stream_size -= last_page_size
+
+    return stream_size
 
-    return size
+# Metadata libraries are only imported if the native reader fails
+mutagen = None
+tinytag = None
+audio_metadata = None
+_metadata_library_imported = False
+
+def _import_metadata_library():
+    global mutagen, tinytag, audio_metadata, _metadata_library_imported
+    if _metadata_library_imported:
+        return
+    try:
+        import mutagen
+        import mutagen.flac
+    except ImportError:
+        mutagen = None
+        try:
+            import tinytag
+        except ImportError:
+            tinytag = None
+            try:
+                import audio_metadata
+            except ImportError:
+                audio_metadata = None
+    _metadata_library_imported = True
 
 def _get_track_metadata_audio_metadata(f):
     metadata = audio_metadata.loads(f.read())
@@ -251,13 +424,279 @@ def _get_track_metadata_mutagen(f):
 
     return metadata
 
-def _get_track_metadata(f):
-    if mutagen is not None:
-        metadata = _get_track_metadata_mutagen(f)
-    elif tinytag is not None:
-        metadata = _get_track_metadata_tinytag(f)
-    elif audio_metadata is not None:
-        metadata = _get_track_metadata_audio_metadata(f)
+def _read_vorbis_comment(data):
+    tags = {}
+    vendor_length = struct.unpack_from("<I", data, 0)[0]
+    pos = 4 + vendor_length
+    nr_comments = struct.unpack_from("<I", data, pos)[0]
+    pos += 4
+    for _ in range(nr_comments):
+        length = struct.unpack_from("<I", data, pos)[0]
+        pos += 4
+        comment = data[pos:pos + length].decode("utf-8", "replace")
+        pos += length
+        key, sep, value = comment.partition("=")
+        if sep:
+            tags.setdefault(key.lower(), []).append(value)
+    return tags
+
+def _read_picture_block(f, read_data=False):
+    # Read a FLAC picture block, but only remember where the picture data is
+    picture_type, mime_length = struct.unpack(">II", f.read(8))
+    mime = f.read(mime_length).decode("ascii", "replace")
+    desc_length = struct.unpack(">I", f.read(4))[0]
+    desc = f.read(desc_length).decode("utf-8", "replace")
+    width, height, depth, colours, length = \
+        struct.unpack(">IIIII", f.read(20))
+    if read_data:
+        return _Picture(type=picture_type, mime=mime, desc=desc, width=width,
+                        height=height, data=f.read(length))
+    return _Picture(type=picture_type, mime=mime, desc=desc, width=width,
+                    height=height, offset=f.tell(), length=length)
+
+def _get_flac_metadata(f, size):
+    metadata = {"codec": "FLAC", "pictures": [], "streaminfo": {},
+                "tags": {}}
+    header = f.read(10)
+    if header[:3] == b"ID3":  # Skip ID3v2 tag
+        id3_size = 10 + ((header[6] & 0x7F) << 21 |
+                         (header[7] & 0x7F) << 14 |
+                         (header[8] & 0x7F) << 7 | (header[9] & 0x7F))
+        if header[5] & 0x10:  # Footer present
+            id3_size += 10
+        f.seek(id3_size)
+    else:
+        f.seek(0)
+    if f.read(4) != b"fLaC":
+        raise ValueError("Not a valid FLAC file")
+
+    streaminfo = None
+    tags = {}
+    last = False
+    while not last:
+        block_header = f.read(4)
+        if len(block_header) < 4:
+            raise ValueError("Not a valid FLAC file")
+        last = bool(block_header[0] & 0x80)
+        block_type = block_header[0] & 0x7F
+        block_size = int.from_bytes(block_header[1:4], "big")
+        block_end = f.tell() + block_size
+        if block_type == 0:  # STREAMINFO
+            streaminfo = f.read(block_size)
+        elif block_type == 4:  # VORBIS_COMMENT
+            tags = _read_vorbis_comment(f.read(block_size))
+        elif block_type == 6:  # PICTURE
+            metadata["pictures"].append(_read_picture_block(f))
+        f.seek(block_end)
+    audio_offset = f.tell()
+    if streaminfo is None or len(streaminfo) < 18:
+        raise ValueError("Stream info block not found")
+
+    info = int.from_bytes(streaminfo[10:18], "big")
+    sample_rate = info >> 44
+    channels = (info >> 41 & 0x07) + 1
+    bit_depth = (info >> 36 & 0x1F) + 1
+    total_samples = info & 0xFFFFFFFFF
+    duration = total_samples / sample_rate if sample_rate else 0
+
+    metadata["streaminfo"]["bit_depth"] = bit_depth
+    if duration:
+        metadata["streaminfo"]["bitrate"] = \
+            int((size - audio_offset) * 8 / duration)
+    else:
+        metadata["streaminfo"]["bitrate"] = 0
+    metadata["streaminfo"]["channels"] = channels
+    metadata["streaminfo"]["duration"] = duration
+    metadata["streaminfo"]["sample_rate"] = sample_rate
+    for tag in ["album", "albumartist", "artist", "date", "title",
+                "tracknumber"]:
+        if tag in tags:
+            metadata["tags"][tag] = tags[tag]
+
+    return metadata
+
+_ogg_crc_table = None
+
+def _get_ogg_crc(data):
+    # CRC-32 of Ogg pages (polynomial 0x04C11DB7, not reflected, no xor)
+    global _ogg_crc_table
+    if _ogg_crc_table is None:
+        table = []
+        for i in range(256):
+            r = i << 24
+            for _ in range(8):
+                if r & 0x80000000:
+                    r = ((r << 1) ^ 0x04C11DB7) & 0xFFFFFFFF
+                else:
+                    r = (r << 1) & 0xFFFFFFFF
+            table.append(r)
+        _ogg_crc_table = table
+    table = _ogg_crc_table
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[(crc >> 24) ^ byte]
+    return crc
+
+def _is_valid_ogg_page(data, pos):
+    # Check header and checksum of the Ogg page at pos, so that page payload
+    # that happens to contain the capture pattern is not mistaken for a page
+    try:
+        (capture_pattern, version, header_type, granule_position,
+         serial_number, page_sequence_no, checksum, page_segments) = \
+            struct.unpack_from('<4sBsqIIIB', data, pos)
+    except struct.error:
+        return False
+    if capture_pattern != b"OggS" or version != 0:
+        return False
+    header_size = 27 + page_segments
+    if pos + header_size > len(data):
+        return False
+    page_size = header_size + sum(data[pos + 27:pos + header_size])
+    if pos + page_size > len(data):
+        return False
+    page = bytearray(data[pos:pos + page_size])
+    page[22:26] = b"\0\0\0\0"
+    return _get_ogg_crc(page) == checksum
+
+def _get_ogg_last_granule(f, serial, size):
+    # The last page of a stream is at most 65307 bytes long, so it should be
+    # found at the end of the file (unless streams are multiplexed)
+    chunk_size = min(size, 2 * 65307)
+    f.seek(size - chunk_size)
+    data = f.read(chunk_size)
+    pos = data.rfind(b"OggS")
+    while pos != -1:
+        try:
+            granule_position, serial_number = \
+                struct.unpack_from('<qI', data, pos + 6)
+            if serial_number == serial and granule_position >= 0 and \
+                    _is_valid_ogg_page(data, pos):
+                return granule_position
+        except struct.error:
+            pass
+        pos = data.rfind(b"OggS", 0, pos)
+
+    # Fall back to walking through all pages
+    f.seek(0)
+    granule = None
+    while True:
+        page = _read_ogg_page(f)
+        if page is None:
+            break
+        if page['serial_number'] == serial and page['granule_position'] >= 0:
+            granule = page['granule_position']
+    if granule is None:
+        raise ValueError("Not a valid Opus file")
+    return granule
+
+def _estimate_ogg_last_granule(f, serial, size, max_bytes=65536):
+    # Extrapolate the last granule position from the pages at the current
+    # position (for members that cannot be seeked without decompressing)
+    start = f.tell()
+    granule = None
+    while f.tell() - start < max_bytes:
+        page = _read_ogg_page_header(f)
+        if page is None:
+            break
+        f.seek(page['body_size'], os.SEEK_CUR)
+        if page['serial_number'] == serial and \
+                page['granule_position'] >= 0:
+            granule = page['granule_position']
+            end = f.tell()
+            if int.from_bytes(page['header_type'], 'little') & 0x04:
+                return granule  # End of stream
+    if not granule:
+        raise ValueError("Not a valid Opus file")
+    return int(granule * (size - start) / (end - start))
+
+def _get_opus_metadata(f, size):
+    metadata = {"codec": "Opus", "pictures": [], "streaminfo": {},
+                "tags": {}}
+    f.seek(0)
+
+    # Identification header
+    while True:
+        page = _read_ogg_page(f)
+        if page is None:
+            raise ValueError("Not a valid Opus file")
+        if page['body'][:8] == b'OpusHead':
+            serial = page['serial_number']
+            head = page['body']
+            break
+    channels = head[9]
+    pre_skip = struct.unpack_from("<H", head, 10)[0]
+
+    # Comment header (might span multiple pages)
+    packet = b""
+    while True:
+        page = _read_ogg_page(f)
+        if page is None:
+            raise ValueError("Not a valid Opus file")
+        if page['serial_number'] != serial:
+            continue
+        packet += page['body']
+        if page['segment_table'] and page['segment_table'][-1] < 255:
+            break
+    if packet[:8] != b'OpusTags':
+        raise ValueError("Not a valid Opus file")
+    tags = _read_vorbis_comment(packet[8:])
+
+    if "metadata_block_picture" in tags:
+        for b64_data in tags["metadata_block_picture"]:
+            try:
+                data = io.BytesIO(base64.b64decode(b64_data))
+                metadata["pictures"].append(
+                    _read_picture_block(data, read_data=True))
+            except Exception:
+                pass
+
+    # Seeking to the end of a compressed member would decompress all of it
+    if isinstance(f, zipfile.ZipExtFile):
+        last_granule = _estimate_ogg_last_granule(f, serial, size)
+    else:
+        last_granule = _get_ogg_last_granule(f, serial, size)
+    duration = (last_granule - pre_skip) / 48000
+    try:
+        stream_size = _get_opus_stream_size(f, size)
+    except Exception:
+        stream_size = size - len(packet)
+    metadata["streaminfo"]["bitrate"] = stream_size * 8 / duration
+    metadata["streaminfo"]["channels"] = channels
+    metadata["streaminfo"]["duration"] = duration
+    metadata["streaminfo"]["sample_rate"] = 48000
+    for tag in ["album", "albumartist", "artist", "date", "title",
+                "tracknumber"]:
+        if tag in tags:
+            metadata["tags"][tag] = tags[tag]
+
+    return metadata
+
+def _get_track_metadata_native(f, size=None):
+    if size is None:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+    f.seek(0)
+    magic = f.read(4)
+    f.seek(0)
+    if magic == b"OggS":
+        return _get_opus_metadata(f, size)
+    elif magic == b"fLaC" or magic[:3] == b"ID3":
+        return _get_flac_metadata(f, size)
+    else:
+        raise ValueError("Unknown file format")
+
+def _get_track_metadata(f, size=None):
+    try:
+        metadata = _get_track_metadata_native(f, size)
+    except Exception:
+        f.seek(0)
+        _import_metadata_library()
+        if mutagen is not None:
+            metadata = _get_track_metadata_mutagen(f)
+        elif tinytag is not None:
+            metadata = _get_track_metadata_tinytag(f)
+        elif audio_metadata is not None:
+            metadata = _get_track_metadata_audio_metadata(f)
 
     # Fix tracknumbers that include total track count (e.g. "1/10")
     try:
@@ -268,6 +707,63 @@ def _get_track_metadata(f):
 
     return metadata
 
+def _read_picture(filename, track, index):
+    with zipfile.ZipFile(filename) as archive:
+        with _open_member(filename, archive, track) as f:
+            size = archive.getinfo(track).file_size
+            return _get_track_metadata(f, size)["pictures"][index].data
+
+def _read_member_range(filename, member, offset, length):
+    with zipfile.ZipFile(filename) as archive:
+        with _open_member(filename, archive, member) as f:
+            f.seek(offset)
+            return f.read(length)
+
+def _bind_pictures(metadata, filename, track):
+    # Let pictures load their data from the album when first accessed
+    for c, picture in enumerate(metadata["pictures"]):
+        if isinstance(picture, _Picture) and picture.loader is None:
+            if picture.offset is not None:
+                picture.loader = functools.partial(
+                    _read_member_range, filename, track, picture.offset,
+                    picture.length)
+            elif picture.data is None:
+                picture.loader = functools.partial(_read_picture, filename,
+                                                   track, c)
+
+def _get_album_signature(filename, archive):
+    stat = os.stat(filename)
+    members = ";".join(f"{x.filename}:{x.CRC:08x}:{x.file_size}"
+                       for x in archive.infolist())
+    return (f"{_METADATA_INDEX_VERSION}|{os.path.abspath(filename)}|"
+            f"{stat.st_size}|{stat.st_mtime_ns}|{members}")
+
+def _dump_track_metadata(tracks):
+    index = {}
+    for track, metadata in tracks.items():
+        pictures = []
+        for picture in metadata["pictures"]:
+            pictures.append({"type": getattr(picture, "type", 3),
+                             "mime": getattr(picture, "mime", ""),
+                             "desc": getattr(picture, "desc", ""),
+                             "width": getattr(picture, "width", 0),
+                             "height": getattr(picture, "height", 0),
+                             "offset": getattr(picture, "offset", None),
+                             "length": getattr(picture, "length", None)})
+        index[track] = {"codec": metadata["codec"],
+                        "pictures": pictures,
+                        "streaminfo": dict(metadata["streaminfo"]),
+                        "tags": {k: list(v) for k,v in \
+                                 metadata["tags"].items()}}
+    return json.dumps(index).encode("utf-8")
+
+def _load_track_metadata(data, filename):
+    tracks = json.loads(data.decode("utf-8"))
+    for track, metadata in tracks.items():
+        metadata["pictures"] = [_Picture(**x) for x in metadata["pictures"]]
+        _bind_pictures(metadata, filename, track)
+    return tracks
+
 def _sort_images(images):
     front = []
     back = []
@@ -282,27 +778,155 @@ def _sort_images(images):
             other.append(x)
     return tuple(front + other + back)
 
+def _get_booklet_document(source):
+    # The source is either a booklet member in a Zipped Album, or a merged
+    # booklet file (if the member is None); a file that was replaced in the
+    # meantime is opened again
+    path, member = source
+    stat = os.stat(path)
+    key = (path, member, stat.st_size, stat.st_mtime_ns)
+    if key in _booklet_documents:
+        _booklet_documents.move_to_end(key)
+        return _booklet_documents[key]
+    for old_key in [x for x in _booklet_documents if x[:2] == source]:
+        _booklet_documents.pop(old_key).close()
+    # Open from memory, so that no file handle keeps the (temporary) booklet
+    # file from being deleted
+    import fitz
+    if member is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    else:
+        with zipfile.ZipFile(path) as archive:
+            with _open_member(path, archive, member) as f:
+                data = f.read()
+    pdf = fitz.open(stream=data, filetype="pdf")
+    _booklet_documents[key] = pdf
+    while len(_booklet_documents) > RENDER_DOCUMENTS:
+        _booklet_documents.popitem(last=False)[1].close()
+    return pdf
+
+def _write_slide(filename, data):
+    # Write to a temporary name first, so that a slide file is never seen
+    # partially written
+    with open(filename + ".part", "wb") as f:
+        f.write(data)
+    os.replace(filename + ".part", filename)
+
+def _write_slide_sizes(im, sizes, filename, cache_key=None):
+    # Write the image in all given sizes (from small to large); `filename`
+    # (without extension) and `cache_key` are templates with a "{size}" field.
+    # Eviction is left to the main process, which gets the size written into
+    # the slide cache returned
+    if im.mode in ("1", "L", "RGB", "CMYK"):
+        options = {"format": "JPEG", "optimize": True}
+        filename += ".jpg"
+    else:
+        options = {"format": "PNG"}
+        filename += ".png"
+    cached = 0
+    for size in sizes:
+        factor = size / max(im.size)
+        if factor < 0.99:
+            resized = im.resize((max(1, round(im.width * factor)),
+                                 max(1, round(im.height * factor))),
+                                Image.LANCZOS)
+        else:
+            resized = im
+        data = io.BytesIO()
+        resized.save(data, **options)
+        _write_slide(filename.format(size=size), data.getvalue())
+        if cache_key is not None:
+            DiskCache("slides", SLIDE_CACHE_SIZE).set(
+                cache_key.format(size=size), data.getvalue(), evict=False)
+            cached += len(data.getvalue())
+    return cached
+
 def _create_booklet_page(args):
     import fitz
-    import io
-    from PIL import Image
-    pdf = fitz.open(args[0])
-    page = pdf[args[1]]
+    source, nr, filename, cache_key = args
+    pdf = _get_booklet_document(source)
+    page = pdf[nr]
     try:
         x, y = page.cropbox[2:]
     except Exception:
         x, y = page.CropBox[2:]
     if x > y:
-        factor = 2160 / x
+        factor = SLIDE_SIZES[-1] / x
     else:
-        factor = 2160 / y
+        factor = SLIDE_SIZES[-1] / y
     try:
         pix = page.get_pixmap(matrix=fitz.Matrix(factor, factor))
-        pix.pil_save(args[2], format="JPEG", optimize=True)
     except Exception:
         pix = page.getPixmap(matrix=fitz.Matrix(factor, factor))
-        pix.pillowWrite(args[2], format="JPEG", optimize=True)
-    pdf.close()
+    im = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    return _write_slide_sizes(im, SLIDE_SIZES, filename, cache_key)
+
+def _create_image_slide(args):
+    path, member, filename = args
+    with zipfile.ZipFile(path) as archive:
+        im = Image.open(io.BytesIO(archive.read(member)))
+        im.load()
+    if im.mode == "P":
+        im = im.convert("RGBA")
+    # The image itself is the largest size
+    sizes = [x for x in SLIDE_SIZES if x < max(im.size)]
+    _write_slide_sizes(im, sizes, filename)
+
+def _get_nr_of_render_workers():
+    return RENDER_WORKERS or os.cpu_count() or 1
+
+def _booklet_page_done(album_ref, nr, result):
+    album = album_ref()
+    if album is not None:
+        album._booklet_page_done(nr, result)
+
+def _booklet_page_failed(album_ref, nr, exception):
+    album = album_ref()
+    if album is not None:
+        album._booklet_page_failed(nr, exception)
+
+def start_render_pool():
+    """Start the process pool for rendering booklet pages.
+
+    The pool is shared by all Zipped Albums and lives until
+    `shutdown_render_pool` is called (or the interpreter exits). Worker
+    processes are spawned (not forked), so that they do not inherit the
+    state of the GUI toolkit.
+
+    Returns
+    -------
+    pool : multiprocessing.pool.Pool object
+        the render pool
+
+    """
+
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            import multiprocessing
+            context = multiprocessing.get_context("spawn")
+            _render_pool = context.Pool(RENDER_WORKERS or None)
+            atexit.unregister(shutdown_render_pool)
+            atexit.register(shutdown_render_pool)
+        return _render_pool
+
+def shutdown_render_pool():
+    """Stop the process pool for rendering booklet pages.
+
+    Pending pages are discarded.
+
+    """
+
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            try:
+                _render_pool.terminate()
+                _render_pool.join()
+            except Exception:
+                pass
+            _render_pool = None
 
 
 def create_zipped_album(directory, filename=None, as_png=False):
@@ -356,14 +980,7 @@ def create_zipped_album(directory, filename=None, as_png=False):
                                 transparent_icon.size[1]), (0, 0, 0, 0))
         cover_mask = Image.open(
             os.path.join(curdir, "cover_mask.png")).convert("RGBA")
-        while True:
-            first_slide = album.get_slide(0)
-            if first_slide is not None:
-                try:
-                    cover = Image.open(first_slide)
-                    break
-                except Exception:
-                    pass
+        cover = Image.open(album.get_slide(0, size=1000, block=True))
         if int(pil_version.split(".")[0]) < 10:
             cover = cover.resize((1000, 1000), Image.ANTIALIAS)
         else:
@@ -411,6 +1028,19 @@ class ZippedAlbum:
         self._alt_encodings = ALT_ENCODINGS
         self._fix_tracknumbers = FIX_TRACKNUMBERS
         self._fix_date = FIX_DATE
+        self._cached_pages = set()
+        self._nr_of_booklet_pages = 0
+        self._merging_booklet = False
+        self._rendered_pages = set()
+        self._render_pending = set()
+        self._render_running = set()
+        self._render_focus = 0
+        self._render_lock = threading.RLock()
+        self._cover_ready_callback = None
+        self._slide_futures = {}
+        self._slide_images = collections.OrderedDict()
+        self._slide_images_size = 0
+        self._slide_images_lock = threading.Lock()
         assert self._content["tracks"]
 
         if exact:
@@ -436,14 +1066,17 @@ class ZippedAlbum:
         if hasattr(self, "_tracks"):
             return self._tracks
         else:
+            if METADATA_INDEX:
+                self._tracks = self._read_metadata_index()
+                if self._tracks is not None:
+                    return self._tracks
             self._tracks = {}
-            for track in self._content["tracks"]:
-                try:
-                    with self._archive.open(track) as f:
-                        self._tracks[track] = _get_track_metadata(f)
-                        #self._archive.read(track))
-                except Exception:
-                    pass
+            for track, metadata in zip(self._content["tracks"],
+                                       self._read_track_metadata()):
+                if metadata is not None:
+                    self._tracks[track] = metadata
+            if METADATA_INDEX:
+                self._write_metadata_index()
             return self._tracks
 
     @property
@@ -468,7 +1101,7 @@ class ZippedAlbum:
                     if date is not None:
                         if date.text:
                             try:
-                                dateutil.parser.parse(date.text)
+                                parse_year(date.text)
                                 playlist["date"] = date.text
                             except Exception:
                                 pass
@@ -538,7 +1171,7 @@ class ZippedAlbum:
             return self._year
         else:
             if "date" in self.playlist:
-                self._year = dateutil.parser.parse(self.playlist["date"]).year
+                self._year = parse_year(self.playlist["date"])
             else:
                 try:
                     date = []
@@ -555,7 +1188,7 @@ class ZippedAlbum:
                     for d in date:
                         for x in d:
                             try:
-                                year = dateutil.parser.parse(x).year
+                                year = parse_year(x)
                                 if year > highest:
                                     highest = year
                                 if year < lowest:
@@ -591,33 +1224,11 @@ class ZippedAlbum:
                         track = self.tracks[filename]
                     except Exception:
                         if self._alt_encodings:
-                            import pkgutil
-                            import encodings
-                            false_positives = set(["aliases"])
-                            encodings = set(
-                                name for imp, name, ispkg in \
-                                pkgutil.iter_modules(
-                                    encodings.__path__) if not ispkg)
-                            encodings.difference_update(false_positives)
-                            encodings = list(encodings)
-                            encodings.insert(0, encodings.pop(encodings.index(
-                                "latin_1")))
-                            encodings.insert(0, encodings.pop(encodings.index(
-                                "cp1252")))
-                            encodings.insert(0, encodings.pop(encodings.index(
-                                "utf_8")))
-                            continue_ = True
-                            for encoding in encodings: #("utf-8", "cp1252"):
-                                try:
-                                    filename = filename.encode(
-                                        encoding).decode("cp437")
-                                    track = self.tracks[filename]
-                                    continue_ = False
-                                    break
-                                except Exception:
-                                    pass
-                            if continue_:
+                            filename = self._get_track_name_index().get(
+                                unicodedata.normalize("NFC", filename))
+                            if filename is None:
                                 continue
+                            track = self.tracks[filename]
                         else:
                             continue
                     #d = datetime.timedelta(
@@ -711,6 +1322,25 @@ class ZippedAlbum:
             self._tracklist = tracklist
             return self._tracklist
 
+    def _get_track_name_index(self):
+        # Map possible original names of tracks (as e.g. found in the
+        # playlist) to their names in the ZIP file, which might have been
+        # decoded wrongly (as CP437) and might differ in Unicode normalization
+        if not hasattr(self, "_track_name_index"):
+            index = {}
+            for name in self.tracks:
+                index.setdefault(unicodedata.normalize("NFC", name), name)
+            for encoding in _ALT_ENCODINGS:
+                for name in self.tracks:
+                    try:
+                        original = name.encode("cp437").decode(encoding)
+                    except Exception:
+                        continue
+                    index.setdefault(unicodedata.normalize("NFC", original),
+                                     name)
+            self._track_name_index = index
+        return self._track_name_index
+
     @property
     def playtime(self):
         if hasattr(self, "_playtime"):
@@ -741,9 +1371,18 @@ class ZippedAlbum:
             return self._nr_of_slides
         else:
             if self._content["booklets"]:
-                booklet = fitz.open(self._booklet_path)
-                booklet_pages = len(booklet)
-                booklet.close()
+                if hasattr(self, "_booklet_source"):
+                    booklet_pages = self._nr_of_booklet_pages
+                else:
+                    booklet_pages = self._get_cached_booklet_pages()
+                    if booklet_pages is None:
+                        try:
+                            booklet = self._open_booklet()[0]
+                            booklet_pages = len(booklet)
+                            booklet.close()
+                            self._set_cached_booklet_pages(booklet_pages)
+                        except Exception:
+                            booklet_pages = 0
             else:
                 booklet_pages = 0
             images = self._content["images"]
@@ -756,6 +1395,64 @@ class ZippedAlbum:
                 self._nr_of_slides = booklet_pages + len(images)
             return self._nr_of_slides
 
+    def _read_track_metadata(self):
+        tracks = self._content["tracks"]
+        workers = METADATA_WORKERS
+        if workers == 0:
+            workers = min(len(tracks), (os.cpu_count() or 1) + 4, 16)
+
+        def read_from(archive, track):
+            try:
+                with _open_member(self._filename, archive, track) as f:
+                    metadata = _get_track_metadata(
+                        f, archive.getinfo(track).file_size)
+                _bind_pictures(metadata, self._filename, track)
+                return metadata
+            except Exception:
+                return None
+
+        if workers <= 1:
+            return [read_from(self._archive, track) for track in tracks]
+
+        # Each worker thread gets its own archive handle, as ZipFile objects
+        # serialise all reads through a lock on their shared file object
+        local = threading.local()
+        archives = []
+
+        def read(track):
+            try:
+                if not hasattr(local, "archive"):
+                    local.archive = zipfile.ZipFile(self._filename)
+                    archives.append(local.archive)
+            except Exception:
+                return None
+            return read_from(local.archive, track)
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                return list(executor.map(read, tracks))
+        finally:
+            for archive in archives:
+                archive.close()
+
+    def _read_metadata_index(self):
+        try:
+            index = DiskCache("metadata", METADATA_INDEX_SIZE)
+            data = index.get(_get_album_signature(self._filename,
+                                                  self._archive))
+            if data is not None:
+                return _load_track_metadata(data, self._filename)
+        except Exception:
+            pass
+
+    def _write_metadata_index(self):
+        try:
+            index = DiskCache("metadata", METADATA_INDEX_SIZE)
+            index.set(_get_album_signature(self._filename, self._archive),
+                      _dump_track_metadata(self._tracks))
+        except Exception:
+            pass
+
     def get_audio(self, nr):
         """Get the audio of a track in the Zipped Album.
 
@@ -766,31 +1463,57 @@ class ZippedAlbum:
 
         Returns
         -------
-        audio : zipfile.ZipExtFile object
-            a binary file-like object holding the audio information
+        audio : zipfile.ZipExtFile object or file-like object
+            a binary file-like object holding the audio information (stored
+            tracks are read directly from the album file and provide their
+            location in it as `byte_range` attribute; all tracks provide
+            their uncompressed size as `file_size` attribute and a
+            `cache_key` attribute identifying the audio data)
 
         """
 
         try:
-            return self._archive.open(self.tracklist[nr]["filename"])
+            member = self.tracklist[nr]["filename"]
+            audio = _open_member(self._filename, self._archive, member)
+            audio.file_size = self._archive.getinfo(member).file_size
+            stat = os.stat(self._filename)
+            audio.cache_key = (os.path.abspath(self._filename), member,
+                               stat.st_size, stat.st_mtime_ns)
+            return audio
         except Exception:
             pass
 
-    def get_slide(self, nr):
+    def get_slide(self, nr, size=None, block=False, timeout=None):
         """Get a slide from the booklet.
 
         Parameters
         ----------
         nr : int
             the number of the slide to get
+        size : int, optional
+            the minimal size (longest edge) needed; the smallest prepared
+            size of the slide that is at least this large is returned
+            (if none is given, return the largest size)
+        block : bool, optional
+            whether to wait until the slide is ready
+        timeout : float, optional
+            the maximal time to wait (in seconds) if block is True
+            (if none is given, wait until the slide is ready)
 
         Returns
         -------
-        slide : io.BytesIO
-            a file-like object holding the slide information
+        slide : str or io.BytesIO or None
+            the path to, or a file-like object holding the slide information
+            (None if the slide is not ready yet)
 
         """
 
+        if block:
+            try:
+                return self.get_slide_future(nr, size).result(timeout)
+            except concurrent.futures.TimeoutError:
+                return None
+
         if nr is None:
             nr = 0
         if nr < 0 or nr > self.nr_of_slides:
@@ -800,29 +1523,357 @@ class ZippedAlbum:
             return os.path.abspath(os.path.join(
             os.path.split(__file__)[0], "unknown_album.png"))
 
-        if self._strict_slides:
-            if self._content["booklets"]:
-                booklet_pages = self.nr_of_slides
-            else:
-                booklet_pages = 0
+        if size is None:
+            sizes = SLIDE_SIZES[-1:]
         else:
-            booklet_pages = self.nr_of_slides - len(self._content["images"])
+            sizes = [x for x in SLIDE_SIZES if x >= size] or SLIDE_SIZES[-1:]
+        booklet_pages = self._get_nr_of_booklet_slides()
         if nr < booklet_pages:
-            filename = os.path.join(self._tmpdir.name, f"{nr}.jpg")
-            if os.path.isfile(filename):
-                return filename
-            else:
-                return None
+            with self._render_lock:
+                if nr in self._cached_pages:
+                    self._restore_booklet_page(nr)
+                for size in sizes:
+                    filename = os.path.join(self._tmpdir.name,
+                                            f"{nr}_{size}.jpg")
+                    if os.path.isfile(filename):
+                        return filename
+                if nr < self._nr_of_booklet_pages and \
+                        nr not in self._rendered_pages and \
+                        nr not in self._render_running:
+                    # Outside of render window
+                    self._render_pending.add(nr)
+            self._schedule_booklet_pages()
+            return None
         else:
+            for size in sizes:
+                for ext in (".jpg", ".png"):
+                    filename = os.path.join(self._tmpdir.name,
+                                            f"{nr}_{size}{ext}")
+                    if os.path.isfile(filename):
+                        return filename
             nr -= booklet_pages
+            return io.BytesIO(self._archive.read(self._get_images()[nr]))
+
+    def get_slide_image(self, nr, size=None):
+        """Get a decoded slide image from the booklet.
+
+        Decoded images are kept in memory (see `IMAGE_CACHE_SIZE`), so
+        returning to a slide does not need to read and decode it again.
+        The returned image is shared and must not be modified or closed.
+
+        Parameters
+        ----------
+        nr : int
+            the number of the slide to get
+        size : int, optional
+            the minimal size (longest edge) needed (see `get_slide`)
+
+        Returns
+        -------
+        image : PIL.Image.Image object or None or False
+            the slide image (None if the slide is not ready yet, False if
+            there is no such slide)
+
+        """
+
+        slide = self.get_slide(nr, size)
+        if not slide:
+            return slide
+        if isinstance(slide, str):
+            key = slide
+            with self._slide_images_lock:
+                if key in self._slide_images:
+                    self._slide_images.move_to_end(key)
+                    return self._slide_images[key]
+            im = Image.open(slide)
+        else:
+            # Original image member; JPEGs are decoded at a reduced scale, if
+            # that is still large enough
+            im = Image.open(slide)
+            factor = size / max(im.size) if size else 1
+            if factor < 1 and im.format == "JPEG":
+                im.draft(im.mode, (int(im.width * factor),
+                                   int(im.height * factor)))
+            key = (nr, im.size)
+            with self._slide_images_lock:
+                if key in self._slide_images:
+                    self._slide_images.move_to_end(key)
+                    return self._slide_images[key]
+        im.load()
+        im_size = im.width * im.height * len(im.getbands())
+        with self._slide_images_lock:
+            self._slide_images[key] = im
+            self._slide_images_size += im_size
+            while self._slide_images_size > IMAGE_CACHE_SIZE and \
+                    len(self._slide_images) > 1:
+                old = self._slide_images.popitem(last=False)[1]
+                self._slide_images_size -= \
+                    old.width * old.height * len(old.getbands())
+        return im
+
+    def get_slide_future(self, nr, size=None):
+        """Get a future for a slide from the booklet.
+
+        The future is done as soon as the slide is ready; use its
+        `add_done_callback` method to get notified about that. Waiting for
+        the future does not poll.
+
+        Parameters
+        ----------
+        nr : int
+            the number of the slide to get
+        size : int, optional
+            the minimal size (longest edge) needed (see `get_slide`)
+
+        Returns
+        -------
+        future : concurrent.futures.Future object
+            a future whose result is the slide as returned by `get_slide`
+            (if rendering the page fails, the future raises the exception)
+
+        """
+
+        future = concurrent.futures.Future()
+        with self._render_lock:
+            slide = self.get_slide(nr, size)
+            if slide is None:
+                self._slide_futures.setdefault(nr, []).append((future, size))
+                return future
+        future.set_result(slide)
+        return future
+
+    def _resolve_slide_futures(self, nr, exception=None):
+        with self._render_lock:
+            futures = self._slide_futures.pop(nr, [])
+        for future, size in futures:
+            if future.cancelled():
+                continue
+            if exception is None:
+                try:
+                    future.set_result(self.get_slide(nr, size))
+                    continue
+                except concurrent.futures.InvalidStateError:  # cancelled
+                    continue
+                except Exception as e:
+                    exception = e
+            try:
+                future.set_exception(exception)
+            except concurrent.futures.InvalidStateError:  # cancelled
+                pass
+
+    def _get_nr_of_booklet_slides(self):
+        if self._strict_slides:
+            if self._content["booklets"]:
+                return self.nr_of_slides
+            else:
+                return 0
+        else:
+            return self.nr_of_slides - len(self._content["images"])
+
+    def _get_images(self):
+        if not hasattr(self, "_images"):
             if self._sort_images:
-                images = _sort_images(self._content["images"])
+                self._images = _sort_images(self._content["images"])
             else:
-                images = self._content["images"]
-            return io.BytesIO(self._archive.read(images[nr]))
+                self._images = tuple(self._content["images"])
+        return self._images
+
+    def _get_booklet_key(self):
+        # Identify the booklet by the central directory entries of its
+        # members and the album signature, so that no booklet data needs to
+        # be read for it
+        if not hasattr(self, "_booklet_key"):
+            booklets = self._content["booklets"]
+            if self._strict_slides:
+                booklets = booklets[:1]
+            members = ";".join(
+                f"{x.filename}:{x.CRC:08x}:{x.file_size}"
+                for x in (self._archive.getinfo(y) for y in booklets))
+            signature = _get_album_signature(self._filename, self._archive)
+            self._booklet_key = hashlib.sha1(
+                f"{signature}|{members}".encode("utf-8")).hexdigest()
+        return self._booklet_key
+
+    def _get_cached_booklet_pages(self):
+        if SLIDE_CACHE:
+            try:
+                return int(DiskCache("slides", SLIDE_CACHE_SIZE).get(
+                    f"{self._get_booklet_key()}:pages"))
+            except Exception:
+                pass
+
+    def _set_cached_booklet_pages(self, nr_pages):
+        if SLIDE_CACHE:
+            try:
+                DiskCache("slides", SLIDE_CACHE_SIZE).set(
+                    f"{self._get_booklet_key()}:pages",
+                    str(nr_pages).encode("utf-8"))
+            except Exception:
+                pass
+
+    def _get_slide_key(self, nr, size="{size}"):
+        return f"{self._get_booklet_key()}:{nr}:{size}"
+
+    def _get_render_args(self, nr):
+        if SLIDE_CACHE:
+            cache_key = self._get_slide_key(nr)
+        else:
+            cache_key = None
+        return (self._booklet_source, nr,
+                os.path.join(self._tmpdir.name, f"{nr}_{{size}}"), cache_key)
+
+    def _restore_booklet_page(self, nr):
+        self._cached_pages.discard(nr)
+        cache = DiskCache("slides", SLIDE_CACHE_SIZE)
+        try:
+            for size in SLIDE_SIZES:
+                data = cache.get(self._get_slide_key(nr, size))
+                if data is None:
+                    # Evicted in the meantime
+                    self._render_pending.add(nr)
+                    return
+                _write_slide(os.path.join(self._tmpdir.name,
+                                          f"{nr}_{size}.jpg"), data)
+            self._rendered_pages.add(nr)
+        except Exception:
+            pass
+
+    def _discard_booklet_page(self, nr):
+        self._rendered_pages.discard(nr)
+        for size in SLIDE_SIZES:
+            try:
+                os.remove(os.path.join(self._tmpdir.name, f"{nr}_{size}.jpg"))
+            except Exception:
+                pass
+        if SLIDE_CACHE:
+            self._cached_pages.add(nr)
+
+    def _in_render_window(self, nr):
+        # The first page (cover image) is always kept
+        return not RENDER_WINDOW or nr == 0 or \
+            abs(nr - self._render_focus) <= RENDER_WINDOW // 2
+
+    def _update_render_window(self):
+        for nr in range(self._nr_of_booklet_pages):
+            if self._in_render_window(nr):
+                if nr not in self._rendered_pages and \
+                        nr not in self._render_running and \
+                        nr not in self._cached_pages:
+                    self._render_pending.add(nr)
+            elif nr not in self._slide_futures:
+                self._render_pending.discard(nr)
+                if nr in self._rendered_pages:
+                    self._discard_booklet_page(nr)
+
+    def _schedule_booklet_pages(self):
+        # Keep only as many pages in the render pool as there are workers, so
+        # that a change of focus takes effect immediately
+        with self._render_lock:
+            if self._render_pending and \
+                    getattr(self, "_booklet_source", None) is None:
+                self._merge_booklet()
+                return
+            try:
+                while self._render_pending and len(self._render_running) < \
+                        _get_nr_of_render_workers():
+                    # Pages somebody waits for come first
+                    nr = min(self._render_pending,
+                             key=lambda x: (x not in self._slide_futures,
+                                            abs(x - self._render_focus), x))
+                    self._render_pending.discard(nr)
+                    self._render_running.add(nr)
+                    album_ref = weakref.ref(self)
+                    start_render_pool().apply_async(
+                        _create_booklet_page, (self._get_render_args(nr),),
+                        callback=functools.partial(_booklet_page_done,
+                                                   album_ref, nr),
+                        error_callback=functools.partial(_booklet_page_failed,
+                                                         album_ref, nr))
+            except Exception:
+                pass
+
+    def _booklet_page_done(self, nr, cached_size=0):
+        if cached_size:
+            DiskCache("slides", SLIDE_CACHE_SIZE).count_written(cached_size)
+        with self._render_lock:
+            self._render_running.discard(nr)
+            self._rendered_pages.add(nr)
+        self._resolve_slide_futures(nr)
+        if nr == 0 and self._cover_ready_callback is not None:
+            self._cover_ready_callback(None)
+        self._schedule_booklet_pages()
+
+    def _booklet_page_failed(self, nr, exception):
+        # The page is not marked as rendered, so that it is scheduled again
+        # when the render window is updated
+        with self._render_lock:
+            self._render_running.discard(nr)
+        self._resolve_slide_futures(nr, exception)
+        self._schedule_booklet_pages()
+
+    def focus_slide(self, nr):
+        """Prioritize rendering the booklet pages around a slide.
+
+        Pages are rendered in order of their distance to the focussed slide,
+        and only pages within `RENDER_WINDOW` of it are kept rendered.
+
+        Parameters
+        ----------
+        nr : int
+            the number of the slide in focus
+
+        """
+
+        with self._render_lock:
+            self._render_focus = nr
+            self._update_render_window()
+        self._schedule_booklet_pages()
+
+    def _merge_booklet(self):
+        # Merged booklets are only written to disk (in the background) once
+        # a page actually needs to be rendered
+        if self._merging_booklet or not hasattr(self, "_booklet_source"):
+            return
+        self._merging_booklet = True
+
+        def merge():
+            try:
+                booklet = self._open_booklet()[0]
+                path = os.path.join(self._tmpdir.name, "booklet.pdf")
+                booklet.save(path)
+                booklet.close()
+                with self._render_lock:
+                    self._booklet_source = (path, None)
+            except Exception:
+                return
+            self._schedule_booklet_pages()
+
+        threading.Thread(target=merge, daemon=True).start()
+
+    def _open_booklet(self):
+        # Return the booklet document and whether it was merged from several
+        # booklets
+        import fitz
+        data = self._archive.read(self._content["booklets"][0])
+        booklet = fitz.open(stream=data, filetype="pdf")
+        merged = False
+        if not self._strict_slides and len(self._content["booklets"]) > 1:
+            for other in self._content["booklets"][1:]:
+                data = self._archive.read(other)
+                doc = fitz.open(stream=data, filetype="pdf")
+                try:
+                    booklet.insert_pdf(doc)
+                except Exception:
+                    booklet.insertPDF(doc)
+                doc.close()
+            merged = True
+        return booklet, merged
 
     def prepare_booklet_pages(self, cover_ready_callback=None):
-        """Prepare booklet pages in separate thread.
+        """Prepare booklet pages and image slides in separate processes.
+
+        Booklet pages are rendered, and all slides are prepared in several
+        sizes (see `SLIDE_SIZES`).
 
         Parameters
         ----------
@@ -832,44 +1883,64 @@ class ZippedAlbum:
         """
 
         if self._content["booklets"]:
-            self._booklet_path = None
+            self._booklet_source = None
             try:
-                booklet = fitz.open(
-                    stream=self._archive.read(self._content["booklets"][0]),
-                    filetype="pdf")
+                # With the page count in the slide cache, the booklet is not
+                # read at all here
+                nr_pages = self._get_cached_booklet_pages()
                 if not self._strict_slides and \
                         len(self._content["booklets"]) > 1:
-                    for other in self._content["booklets"][1:]:
-                        doc = fitz.open(stream=self._archive.read(other),
-                                        filetype="pdf")
-                        try:
-                            booklet.insert_pdf(doc)
-                        except Exception:
-                            booklet.insertPDF(doc)
-                        doc.close()
-                path = os.path.join(self._tmpdir.name, "booklet.pdf")
-                booklet.save(path)
-                nr_pages = len(booklet)
-                booklet.close()
-                self._booklet_path = path
-
-                # Prepare first page (cover image)
-                pool = multiprocessing.Pool()
-                pool.apply_async(_create_booklet_page,
-                                 ([self._booklet_path, 0,
-                                   os.path.join(self._tmpdir.name, "0.jpg")],),
-                                 callback=cover_ready_callback)
-
-                # Prepare other pages
-                page_numbers = []
-                filepaths = []
-                for p in range(1, nr_pages):
-                    page_numbers.append(p)
-                    filepaths.append(os.path.join(self._tmpdir.name,
-                                                  f"{p}.jpg"))
-                func_args = zip([self._booklet_path] * len(page_numbers),
-                                page_numbers, filepaths)
-                pool.map_async(_create_booklet_page, func_args)
+                    # Merged booklets need to be written to disk, which
+                    # happens when a page needs to be rendered
+                    if nr_pages is None:
+                        booklet = self._open_booklet()[0]
+                        path = os.path.join(self._tmpdir.name, "booklet.pdf")
+                        booklet.save(path)
+                        self._booklet_source = (path, None)
+                        nr_pages = len(booklet)
+                        booklet.close()
+                        self._set_cached_booklet_pages(nr_pages)
+                else:
+                    # Single booklets are read by the render workers from the
+                    # album
+                    if nr_pages is None:
+                        booklet = self._open_booklet()[0]
+                        nr_pages = len(booklet)
+                        booklet.close()
+                        self._set_cached_booklet_pages(nr_pages)
+                    self._booklet_source = (os.path.abspath(self._filename),
+                                            self._content["booklets"][0])
+
+                # Pages rendered before are taken from the slide cache
+                with self._render_lock:
+                    if SLIDE_CACHE:
+                        cache = DiskCache("slides", SLIDE_CACHE_SIZE)
+                        self._cached_pages = set(
+                            p for p in range(nr_pages)
+                            if all(self._get_slide_key(p, x) in cache
+                                   for x in SLIDE_SIZES))
+                    self._nr_of_booklet_pages = nr_pages
+                    self._cover_ready_callback = cover_ready_callback
+                    self._update_render_window()
+
+                # Render pages, starting with the first page (cover image)
+                self._schedule_booklet_pages()
+
+                if 0 in self._cached_pages and cover_ready_callback:
+                    cover_ready_callback(None)
 
             except Exception:
                 pass
+
+        # Prepare smaller sizes of image slides
+        try:
+            booklet_pages = self._get_nr_of_booklet_slides()
+            if booklet_pages < self.nr_of_slides:
+                func_args = [
+                    (self._filename, image,
+                     os.path.join(self._tmpdir.name,
+                                  f"{booklet_pages + idx}_{{size}}"))
+                    for idx, image in enumerate(self._get_images())]
+                start_render_pool().map_async(_create_image_slide, func_args)
+        except Exception:
+            pass
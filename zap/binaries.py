@@ -2,19 +2,12 @@ import os
 import sys
 import platform
 import sysconfig
-import ssl
-from urllib.request import urlopen, Request
-from urllib.error import HTTPError
 from tempfile import TemporaryFile
 from zipfile import ZipFile
 from shutil import copyfileobj
 
-try:
-    import certifi
-except ImportError:
-    certifi = None
-
 from .utils import get_config_folder
+from .cache import get_file_signature, get_cached_probe, set_cached_probe
 
 
 def _f(q):
@@ -38,8 +31,31 @@ def _f(q):
     except Exception:
         q.put(False)
 
+def _get_ffmpeg_probe_key():
+    import importlib.util
+    try:
+        pyglet_path = importlib.util.find_spec("pyglet").origin
+    except Exception:
+        pyglet_path = None
+    if platform.system() == "Windows":
+        library_path = os.environ.get("PATH", "")
+    else:
+        library_path = os.environ.get("LD_LIBRARY_PATH", "")
+    folders = [x for x in library_path.split(os.pathsep) if x]
+    return [sys.executable, library_path] + get_file_signature(
+        pyglet_path, os.path.join(get_config_folder(), "ffmpeg"), *folders)
+
 def has_ffmpeg():
-    """Return boolean indicating whether FFmpeg can be found."""
+    """Return boolean indicating whether FFmpeg can be found.
+
+    A positive result is cached across sessions, as long as the Python
+    executable, pyglet and the library folders stay unchanged.
+
+    """
+
+    key = _get_ffmpeg_probe_key()
+    if get_cached_probe("has_ffmpeg", key):
+        return True
 
     import multiprocessing
     q = multiprocessing.Queue()
@@ -47,7 +63,10 @@ def has_ffmpeg():
     p = multiprocessing.Process(target=_f, args=(q,))
     p.start()
     p.join()
-    return q.get()
+    result = q.get()
+    if result:
+        set_cached_probe("has_ffmpeg", key, True)
+    return result
 
 def get_platform():
     """Return a string with current platform (system and machine architecture).
@@ -111,6 +130,13 @@ def download_ffmpeg(progress=None):
 
     """
 
+    import ssl
+    from urllib.request import urlopen, Request
+    try:
+        import certifi
+    except ImportError:
+        certifi = None
+
     platform = get_platform()
     url_base = "https://github.com/zipped-album/zap-binaries/raw/main/ffmpeg"
 
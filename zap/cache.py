@@ -0,0 +1,289 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+from .utils import get_config_folder
+
+
+def get_cache_folder(name=None):
+    """Return the ZAP cache folder.
+
+    Parameters
+    ----------
+    name : str, optional
+        the name of a specific cache inside the cache folder
+
+    Returns
+    -------
+    cache_folder : str
+        the (specific) ZAP cache folder
+
+    """
+
+    folder = os.path.join(get_config_folder(), "cache")
+    if name is not None:
+        folder = os.path.join(folder, name)
+    return folder
+
+
+_EVICTION_FRACTION = 16  # evict after writing 1/16 of the budget
+_written = {}  # bytes written per cache folder since the last eviction
+_written_lock = threading.Lock()
+
+
+class DiskCache:
+    """A size-bounded key/value store in the ZAP cache folder.
+
+    Each entry is stored in its own file, named after the hash of its key.
+    Reading an entry refreshes its modification time, and once a fraction of
+    the budget has been written since the last eviction, the least recently
+    used entries are evicted until the total size is within the budget.
+    All errors (e.g. a read-only file system) are silently ignored and
+    treated like a cache miss.
+
+    """
+
+    def __init__(self, name, max_size):
+        """Create a DiskCache object.
+
+        Parameters
+        ----------
+        name : str
+            the name of the cache (used as folder name)
+        max_size : int
+            the maximal total size of all entries (in bytes)
+
+        """
+
+        self._folder = get_cache_folder(name)
+        self._max_size = max_size
+
+    @property
+    def folder(self):
+        return self._folder
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    def _get_path(self, key):
+        return os.path.join(self._folder,
+                            hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def __contains__(self, key):
+        return os.path.isfile(self._get_path(key))
+
+    def get(self, key):
+        """Get an entry from the cache.
+
+        Parameters
+        ----------
+        key : str
+            the key of the entry
+
+        Returns
+        -------
+        data : bytes or None
+            the data of the entry (None if not in cache)
+
+        """
+
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except Exception:
+            return None
+
+    def set(self, key, data, evict=True):
+        """Put an entry into the cache.
+
+        Parameters
+        ----------
+        key : str
+            the key of the entry
+        data : bytes
+            the data of the entry
+        evict : bool, optional
+            whether to account for the written data and evict entries if
+            necessary (worker processes should set this to False and let the
+            main process call `count_written` instead)
+
+        """
+
+        if len(data) > self._max_size:
+            return
+        try:
+            if not os.path.isdir(self._folder):
+                os.makedirs(self._folder)
+            fd, tmp_path = tempfile.mkstemp(dir=self._folder, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._get_path(key))
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        except Exception:
+            return
+        if evict:
+            self.count_written(len(data))
+
+    def count_written(self, size):
+        """Account for data written into the cache.
+
+        Entries are only evicted (which scans the whole cache folder) on the
+        first write in this process and whenever a fraction of the budget has
+        been written since.
+
+        Parameters
+        ----------
+        size : int
+            the number of bytes written
+
+        """
+
+        with _written_lock:
+            written = _written.get(self._folder)
+            if written is not None and \
+                    (written + size) * _EVICTION_FRACTION < self._max_size:
+                _written[self._folder] = written + size
+                return
+            _written[self._folder] = 0
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until within size budget."""
+
+        try:
+            entries = []
+            for entry in os.scandir(self._folder):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except Exception:
+            return
+        total_size = sum(x[1] for x in entries)
+        for mtime, size, path in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+            except Exception:
+                pass
+
+    def delete(self, key):
+        """Remove an entry.
+
+        Parameters
+        ----------
+        key : str
+            the key of the entry
+
+        """
+
+        try:
+            os.remove(self._get_path(key))
+        except Exception:
+            pass
+
+    def clear(self):
+        """Remove all entries."""
+
+        try:
+            for entry in os.scandir(self._folder):
+                try:
+                    os.remove(entry.path)
+                except Exception:
+                    pass
+        except Exception:
+            pass
+
+
+_PROBE_CACHE_SIZE = 1024 ** 2
+
+def get_file_signature(*paths):
+    """Return a signature of files or folders for use in a probe cache key.
+
+    Parameters
+    ----------
+    *paths : str
+        the paths of the files or folders
+
+    Returns
+    -------
+    signature : list
+        the paths with their modification times (None if not existing)
+
+    """
+
+    signature = []
+    for path in paths:
+        try:
+            signature.append([path, os.stat(path).st_mtime_ns])
+        except Exception:
+            signature.append([path, None])
+    return signature
+
+def get_cached_probe(name, key):
+    """Return the cached result of an environment probe.
+
+    Parameters
+    ----------
+    name : str
+        the name of the probe
+    key : list
+        everything the result of the probe depends on (JSON serializable)
+
+    Returns
+    -------
+    result : object or None
+        the cached result (None if not cached or if the key has changed)
+
+    """
+
+    data = DiskCache("probes", _PROBE_CACHE_SIZE).get(name)
+    try:
+        entry = json.loads(data)
+        if entry["key"] == json.loads(json.dumps(key)):
+            return entry["result"]
+    except Exception:
+        pass
+    return None
+
+def set_cached_probe(name, key, result):
+    """Cache the result of an environment probe.
+
+    Parameters
+    ----------
+    name : str
+        the name of the probe
+    key : list
+        everything the result of the probe depends on (JSON serializable)
+    result : object
+        the result of the probe (JSON serializable)
+
+    """
+
+    try:
+        data = json.dumps({"key": key, "result": result}).encode("utf-8")
+    except Exception:
+        return
+    DiskCache("probes", _PROBE_CACHE_SIZE).set(name, data)
+
+def clear_cached_probe(name):
+    """Remove the cached result of an environment probe.
+
+    Parameters
+    ----------
+    name : str
+        the name of the probe
+
+    """
+
+    DiskCache("probes", _PROBE_CACHE_SIZE).delete(name)
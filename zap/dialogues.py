@@ -11,6 +11,7 @@ from tkinter import messagebox
 
 from .__init__ import __version__
 from .utils import get_config_folder, delete_folder_on_exit
+from .cache import get_cache_folder
 
 
 class DialogueWindow(tk.Toplevel):
@@ -128,9 +129,11 @@ class SettingsDialogue(DialogueWindow):
         style.configure("Bold.TLabelframe.Label", font=bold_font)
 
         # Audio
-        from .player import AudioPlayer
-        self.available_audio_systems = AudioPlayer.available_audio_systems
-        self.available_sample_formats = AudioPlayer.available_sample_formats
+        from .player import get_available_audio_systems, get_sample_formats
+        self.available_audio_systems = get_available_audio_systems(
+            recheck_unavailable=True)
+        self.available_sample_formats = {
+            x: get_sample_formats(x) for x in self.available_audio_systems}
 
         audio_frame = ttk.LabelFrame(self.frame, text="Audio",
                                      style="Bold.TLabelframe",
@@ -280,8 +283,8 @@ class SettingsDialogue(DialogueWindow):
 
     def clear_data(self):
         msg = ("This will delete the contents of the Local Data Folder "
-               "(config file, downloaded FFmpeg libraries) and close the "
-               "application!\n\nContinue?")
+               "(config file, cached album data, downloaded FFmpeg libraries) "
+               "and close the application!\n\nContinue?")
 
         if messagebox.askyesno("Clear Local Data", msg, icon='warning',
                                parent=self):
@@ -295,6 +298,9 @@ class SettingsDialogue(DialogueWindow):
                 messagebox.showerror(
                     "Error",
                     f'Could not delete configuration file "{config_file}"!')
+            cache_folder = get_cache_folder()
+            if os.path.exists(cache_folder):
+                shutil.rmtree(cache_folder, ignore_errors=True)
             if os.path.exists(ffmpeg_folder):
                 delete_folder_on_exit(ffmpeg_folder)
             self.parent.parent.destroy()
@@ -1,11 +1,17 @@
 import os
 import sys
 import math
+import time
+import queue
 import platform
 import tempfile
+import collections
+import threading
+import concurrent.futures
 from ctypes import c_double, c_uint64, c_void_p
 
 from .utils import get_config_folder
+from .cache import get_file_signature, get_cached_probe, set_cached_probe
 
 
 if platform.system() == "Windows":
@@ -24,230 +30,402 @@ else:
 import pyglet
 #pyglet.options['search_local_libs'] = True
 pyglet.options['audio'] = ('silent')
+pyglet.options['shadow_window'] = False  # no OpenGL needed for audio only
 
 assert pyglet.media.codecs.have_ffmpeg()
 
 from pyglet.media.codecs.ffmpeg import *
 
 
-def _discover_available_audio_systems():
-    available_audio_systems = {}
+def _setup_xaudio2():
+    from pyglet.media.drivers import xaudio2
+    d = {"driver": "xaudio2",
+         "int32": False,
+         "float32": False}
 
-    try:  #XAudio2
-        from pyglet.media.drivers import xaudio2
-        d = {"driver": "xaudio2",
-             "int32": False,
-             "float32": False}
+    # Monkey patch support for 32-bit int and float
+    try:
+        def create_xa2_waveformat(audio_format):
+            from pyglet.media.drivers.xaudio2 import lib_xaudio2 as lib
 
-        # Monkey patch support for 32-bit int and float
-        try:
-            def create_xa2_waveformat(audio_format):
-                from pyglet.media.drivers.xaudio2 import lib_xaudio2 as lib
+            if audio_format.channels > 2 or \
+                    audio_format.sample_size not in (8, 16, 32):
+                raise MediaException(
+                    f'Unsupported audio format: {audio_format}')
 
-                if audio_format.channels > 2 or \
-                        audio_format.sample_size not in (8, 16, 32):
-                    raise MediaException(
-                        f'Unsupported audio format: {audio_format}')
+            wfx = lib.WAVEFORMATEX()
+            if audio_format.sample_type == "float":
+                wfx.wFormatTag = 3
+            else:
+                wfx.wFormatTag = lib.WAVE_FORMAT_PCM
+            wfx.nChannels = audio_format.channels
+            wfx.nSamplesPerSec = audio_format.sample_rate
+            wfx.wBitsPerSample = audio_format.sample_size
+            wfx.nBlockAlign = wfx.wBitsPerSample * wfx.nChannels // 8
+            wfx.nAvgBytesPerSec = wfx.nSamplesPerSec * wfx.nBlockAlign
+            return wfx
 
-                wfx = lib.WAVEFORMATEX()
-                if audio_format.sample_type == "float":
-                    wfx.wFormatTag = 3
-                else:
-                    wfx.wFormatTag = lib.WAVE_FORMAT_PCM
-                wfx.nChannels = audio_format.channels
-                wfx.nSamplesPerSec = audio_format.sample_rate
-                wfx.wBitsPerSample = audio_format.sample_size
-                wfx.nBlockAlign = wfx.wBitsPerSample * wfx.nChannels // 8
-                wfx.nAvgBytesPerSec = wfx.nSamplesPerSec * wfx.nBlockAlign
-                return wfx
+        xaudio2.interface.create_xa2_waveformat = create_xa2_waveformat
 
-            xaudio2.interface.create_xa2_waveformat = create_xa2_waveformat
+        d["int32"] =  True
+        d["float32"] = True
 
-            d["int32"] =  True
-            d["float32"] = True
+    except Exception:
+        pass
 
-        except Exception:
-            pass
+    return d
 
-        available_audio_systems["XAudio2"] = d
+def _setup_directsound():
+    from pyglet.media.drivers import directsound
+    d = {"driver": "directsound",
+         "int32": False,
+         "float32": False}
 
-    except Exception:
-        pass
+    # Monkey patch support for 32-bit int and float
+    try:
+        def _create_wave_format(audio_format):
+            from pyglet.media.drivers.directsound import lib_dsound as lib
 
-    try:  # DirectSound
-        from pyglet.media.drivers import directsound
-        d = {"driver": "directsound",
-             "int32": False,
-             "float32": False}
+            if audio_format.channels > 2 or \
+                    audio_format.sample_size not in (8, 16, 32):
+                raise MediaException(
+                    f'Unsupported audio format: {audio_format}')
 
-        # Monkey patch support for 32-bit int and float
-        try:
-            def _create_wave_format(audio_format):
-                from pyglet.media.drivers.directsound import lib_dsound as lib
+            wfx = lib.WAVEFORMATEX()
+            if audio_format.sample_type == "float":
+                wfx.wFormatTag = 3
+            else:
+                wfx.wFormatTag = lib.WAVE_FORMAT_PCM
+            wfx.nChannels = audio_format.channels
+            wfx.nSamplesPerSec = audio_format.sample_rate
+            wfx.wBitsPerSample = audio_format.sample_size
+            wfx.nBlockAlign = wfx.wBitsPerSample * wfx.nChannels // 8
+            wfx.nAvgBytesPerSec = wfx.nSamplesPerSec * wfx.nBlockAlign
+            return wfx
 
-                if audio_format.channels > 2 or \
-                        audio_format.sample_size not in (8, 16, 32):
-                    raise MediaException(
-                        f'Unsupported audio format: {audio_format}')
+        directsound.interface._create_wave_format = _create_wave_format
 
-                wfx = lib.WAVEFORMATEX()
-                if audio_format.sample_type == "float":
-                    wfx.wFormatTag = 3
-                else:
-                    wfx.wFormatTag = lib.WAVE_FORMAT_PCM
-                wfx.nChannels = audio_format.channels
-                wfx.nSamplesPerSec = audio_format.sample_rate
-                wfx.wBitsPerSample = audio_format.sample_size
-                wfx.nBlockAlign = wfx.wBitsPerSample * wfx.nChannels // 8
-                wfx.nAvgBytesPerSec = wfx.nSamplesPerSec * wfx.nBlockAlign
-                return wfx
+        d["int32"] =  True
+        d["float32"] = True
 
-            directsound.interface._create_wave_format = _create_wave_format
+    except Exception:
+          pass
+
+    return d
+
+def _setup_pulseaudio():
+    from pyglet.media.drivers import pulse
+    d = {"driver": "pulse",
+         "int32": False,
+         "float32": False}
+
+    # Monkey patch support for 32-bit int and float
+    try:
+        def create_sample_spec(self, audio_format):
+            """
+            Create a PulseAudio sample spec from pyglet audio format.
+            """
+
+            from pyglet.media.drivers.pulse import lib_pulseaudio as pa
+
+            _FORMATS = {
+                ('little', 8, 'int'):    pa.PA_SAMPLE_U8,
+                ('big', 8, 'int'):       pa.PA_SAMPLE_U8,
+                ('little', 16, 'int'):   pa.PA_SAMPLE_S16LE,
+                ('big', 16, 'int'):      pa.PA_SAMPLE_S16BE,
+                ('little', 24, 'int'):   pa.PA_SAMPLE_S24LE,
+                ('big', 24, 'int'):      pa.PA_SAMPLE_S24BE,
+                ('little', 32, 'int'):   pa.PA_SAMPLE_S32LE,
+                ('big', 32, 'int'):      pa.PA_SAMPLE_S32BE,
+                ('little', 32, 'float'): pa.PA_SAMPLE_FLOAT32LE,
+                ('big', 32, 'float'):    pa.PA_SAMPLE_FLOAT32BE,
+            }
+            fmt = (sys.byteorder, audio_format.sample_size,
+                   audio_format.sample_type)
+            if fmt not in _FORMATS:
+                raise MediaException(
+                    f'Unsupported sample size/format: {fmt}')
 
-            d["int32"] =  True
-            d["float32"] = True
+            sample_spec = pa.pa_sample_spec()
+            sample_spec.format = _FORMATS[fmt]
+            sample_spec.rate = audio_format.sample_rate
+            sample_spec.channels = audio_format.channels
+            return sample_spec
 
-        except Exception:
-              pass
+        pulse.interface.PulseAudioStream.create_sample_spec = \
+            create_sample_spec
 
-        available_audio_systems["DirectSound"] = d
+        d["int32"] =  True
+        d["float32"] = True
 
     except Exception:
         pass
 
-    try:  # PulseAudio
-        from pyglet.media.drivers import pulse
-        d = {"driver": "pulse",
-             "int32": False,
-             "float32": False}
+    return d
 
-        # Monkey patch support for 32-bit int and float
-        try:
-            def create_sample_spec(self, audio_format):
-                """
-                Create a PulseAudio sample spec from pyglet audio format.
-                """
-
-                from pyglet.media.drivers.pulse import lib_pulseaudio as pa
-
-                _FORMATS = {
-                    ('little', 8, 'int'):    pa.PA_SAMPLE_U8,
-                    ('big', 8, 'int'):       pa.PA_SAMPLE_U8,
-                    ('little', 16, 'int'):   pa.PA_SAMPLE_S16LE,
-                    ('big', 16, 'int'):      pa.PA_SAMPLE_S16BE,
-                    ('little', 24, 'int'):   pa.PA_SAMPLE_S24LE,
-                    ('big', 24, 'int'):      pa.PA_SAMPLE_S24BE,
-                    ('little', 32, 'int'):   pa.PA_SAMPLE_S32LE,
-                    ('big', 32, 'int'):      pa.PA_SAMPLE_S32BE,
-                    ('little', 32, 'float'): pa.PA_SAMPLE_FLOAT32LE,
-                    ('big', 32, 'float'):    pa.PA_SAMPLE_FLOAT32BE,
-                }
-                fmt = (sys.byteorder, audio_format.sample_size,
-                       audio_format.sample_type)
-                if fmt not in _FORMATS:
-                    raise MediaException(
-                        f'Unsupported sample size/format: {fmt}')
-
-                sample_spec = pa.pa_sample_spec()
-                sample_spec.format = _FORMATS[fmt]
-                sample_spec.rate = audio_format.sample_rate
-                sample_spec.channels = audio_format.channels
-                return sample_spec
-
-            pulse.interface.PulseAudioStream.create_sample_spec = \
-                create_sample_spec
-
-            d["int32"] =  True
-            d["float32"] = True
+def _setup_openal():
+    from pyglet.media.drivers import openal
 
-        except Exception:
-            pass
+    # Monkey patch support for 32-bit int and float if extensions available
+    _format_map = {
+        (1, 8, 'int'):openal.lib_openal.AL_FORMAT_MONO8,
+        (1, 16, 'int'):openal.lib_openal.AL_FORMAT_MONO16,
+        (2, 8, 'int'):openal.lib_openal.AL_FORMAT_STEREO8,
+        (2, 16, 'int'):openal.lib_openal.AL_FORMAT_STEREO16,
+    }
 
-        available_audio_systems["PulseAudio"] = d
+    driver = openal.create_audio_driver()
+    int32 = bool(
+        openal.lib_openal.alIsExtensionPresent(b"AL_EXT_32bit_formats"))
+    if int32:
+        _format_map[(1, 32, 'int')] = openal.lib_openal.alGetEnumValue(
+            b"AL_FORMAT_MONO_I32")
+        _format_map[(2, 32, 'int')] = openal.lib_openal.alGetEnumValue(
+            b"AL_FORMAT_STEREO_I32")
 
-    except Exception:
-        pass
+    float32 = bool(
+        openal.lib_openal.alIsExtensionPresent(b"AL_EXT_float32"))
+    if float32:
+        _format_map[(1, 32, 'float')] = openal.lib_openal.alGetEnumValue(
+            b"AL_FORMAT_MONO_FLOAT32")
+        _format_map[(2, 32, 'float')] = openal.lib_openal.alGetEnumValue(
+            b"AL_FORMAT_STEREO_FLOAT32")
 
-    try:  # OpenAL
-        from pyglet.media.drivers import openal
-
-        # Monkey patch support for 32-bit int and float if extensions available
-        _format_map = {
-            (1, 8, 'int'):openal.lib_openal.AL_FORMAT_MONO8,
-            (1, 16, 'int'):openal.lib_openal.AL_FORMAT_MONO16,
-            (2, 8, 'int'):openal.lib_openal.AL_FORMAT_STEREO8,
-            (2, 16, 'int'):openal.lib_openal.AL_FORMAT_STEREO16,
-        }
-
-        driver = openal.create_audio_driver()
-        int32 = bool(
-            openal.lib_openal.alIsExtensionPresent(b"AL_EXT_32bit_formats"))
-        if int32:
-            _format_map[(1, 32, 'int')] = openal.lib_openal.alGetEnumValue(
-                b"AL_FORMAT_MONO_I32")
-            _format_map[(2, 32, 'int')] = openal.lib_openal.alGetEnumValue(
-                b"AL_FORMAT_STEREO_I32")
-
-        float32 = bool(
-            openal.lib_openal.alIsExtensionPresent(b"AL_EXT_float32"))
-        if float32:
-            _format_map[(1, 32, 'float')] = openal.lib_openal.alGetEnumValue(
-                b"AL_FORMAT_MONO_FLOAT32")
-            _format_map[(2, 32, 'float')] = openal.lib_openal.alGetEnumValue(
-                b"AL_FORMAT_STEREO_FLOAT32")
-
-        driver.delete()
-
-        def data(self, audio_data, audio_format):
-            from pyglet.media.drivers.openal import lib_openal as al
-
-            assert self.is_valid
+    driver.delete()
+
+    def data(self, audio_data, audio_format):
+        from pyglet.media.drivers.openal import lib_openal as al
+
+        assert self.is_valid
+
+        try:
+            al_format = self._format_map[(audio_format.channels,
+                                          audio_format.sample_size,
+                                          audio_format.sample_type)]
+        except KeyError:
+            raise MediaException(
+                f"OpenAL does not support '{audio_format.sample_size}bit ",
+                f"{audio_format.sample_type}' audio.")
+
+        al.alBufferData(self.al_name,
+                        al_format,
+                        audio_data.pointer,
+                        audio_data.length,
+                        audio_format.sample_rate)
+        self._check_error('Failed to add data to buffer.')
+
+    openal.interface.OpenALBuffer._format_map = _format_map
+    openal.interface.OpenALBuffer.data = data
+
+    d = {"driver": "openal",
+         "int32": int32,
+         "float32": float32}
+    return d
+
+def _setup_silent():
+    return {"driver": "silent",
+            "int32": True,
+            "float32": False}
+
+ENGINE_INTERVALL = 0.01  # update intervall of audio engine (in s)
+ENGINE_CLOSE_TIMEOUT = 1  # max. time to wait for the engine thread (in s)
+PCM_CACHE = True  # keep decoded audio of recently played tracks in memory
+PCM_CACHE_SIZE = 64 * 1024 ** 2  # in bytes (about 6 min. of CD audio)
+
+AUDIO_SYSTEMS = {"XAudio2": _setup_xaudio2,  # in order of preference
+                 "DirectSound": _setup_directsound,
+                 "PulseAudio": _setup_pulseaudio,
+                 "OpenAL": _setup_openal,
+                 "Silent": _setup_silent}
+
+_audio_systems = {}  # audio systems set up in this session
+_audio_systems_lock = threading.RLock()
+
+def _get_audio_systems_cache_key():
+    return [sys.executable, platform.system()] + \
+        get_file_signature(pyglet.__file__)
+
+def get_audio_system(audio_system):
+    """Set up an audio system and return its capabilities.
+
+    Only the requested driver is imported (and patched), and the result is
+    stored in the cached capability table.
+
+    Parameters
+    ----------
+    audio_system : str
+        the name of the audio system (see `AUDIO_SYSTEMS`)
+
+    Returns
+    -------
+    capabilities : dict or None
+        the driver name and its support for 32-bit int and float samples
+        (None if the audio system is not available)
 
+    """
+
+    with _audio_systems_lock:
+        if audio_system not in _audio_systems:
             try:
-                al_format = self._format_map[(audio_format.channels,
-                                              audio_format.sample_size,
-                                              audio_format.sample_type)]
-            except KeyError:
-                raise MediaException(
-                    f"OpenAL does not support '{audio_format.sample_size}bit ",
-                    f"{audio_format.sample_type}' audio.")
+                capabilities = AUDIO_SYSTEMS[audio_system]()
+            except Exception:
+                capabilities = None
+            _audio_systems[audio_system] = capabilities
+            key = _get_audio_systems_cache_key()
+            table = get_cached_probe("audio_systems", key) or {}
+            if table.get(audio_system, False) != capabilities:
+                table[audio_system] = capabilities
+                set_cached_probe("audio_systems", key, table)
+        return _audio_systems[audio_system]
+
+def get_available_audio_systems(recheck_unavailable=False):
+    """Return all available audio systems and their capabilities.
+
+    Audio systems that have not been set up in this session are taken from
+    the cached capability table, and only probed if not in there.
+
+    Parameters
+    ----------
+    recheck_unavailable : bool, optional
+        whether to probe audio systems again that are cached as not
+        available (e.g. to find newly installed ones)
+
+    Returns
+    -------
+    audio_systems : dict
+        the names of the available audio systems (in order of preference)
+        with their capabilities
 
-            al.alBufferData(self.al_name,
-                            al_format,
-                            audio_data.pointer,
-                            audio_data.length,
-                            audio_format.sample_rate)
-            self._check_error('Failed to add data to buffer.')
+    """
 
-        openal.interface.OpenALBuffer._format_map = _format_map
-        openal.interface.OpenALBuffer.data = data
+    with _audio_systems_lock:
+        table = get_cached_probe("audio_systems",
+                                 _get_audio_systems_cache_key()) or {}
+        available_audio_systems = {}
+        for audio_system in AUDIO_SYSTEMS:
+            if recheck_unavailable and \
+                    (_audio_systems.get(audio_system, False) is None or
+                     table.get(audio_system, False) is None):
+                # Forget that it was not available, so that it is set up
+                # again
+                _audio_systems.pop(audio_system, None)
+                capabilities = get_audio_system(audio_system)
+            elif audio_system in _audio_systems or audio_system not in table:
+                capabilities = get_audio_system(audio_system)
+            else:
+                capabilities = table[audio_system]
+            if capabilities is not None:
+                available_audio_systems[audio_system] = capabilities
+        return available_audio_systems
 
-        d = {"driver": "openal",
-             "int32": int32,
-             "float32": float32}
-        available_audio_systems["OpenAL"] = d
+def get_default_audio_system():
+    """Return the most preferred available audio system.
 
-    except Exception:
-        pass
+    Audio systems known (from the cached capability table) to be not
+    available are skipped without probing.
 
-    # Add Silent output
-    available_audio_systems["Silent"] = {"driver": "silent",
-                                         "int32": True,
-                                         "float32": False}
+    Returns
+    -------
+    audio_system : str
+        the name of the audio system
 
-    return available_audio_systems
+    """
 
-AVAILABLE_AUDIO_SYSTEMS = _discover_available_audio_systems()
+    with _audio_systems_lock:
+        table = get_cached_probe("audio_systems",
+                                 _get_audio_systems_cache_key()) or {}
+        for audio_system in AUDIO_SYSTEMS:
+            if table.get(audio_system, False) is None:
+                continue
+            if get_audio_system(audio_system) is not None:
+                return audio_system
+        return "Silent"
+
+def get_sample_formats(audio_system):
+    """Return the sample formats supported by an audio system.
+
+    Parameters
+    ----------
+    audio_system : str
+        the name of the audio system
+
+    Returns
+    -------
+    sample_formats : dict
+        the names of the sample formats with their FFmpeg sample format
+
+    """
+
+    if audio_system in _audio_systems:
+        capabilities = _audio_systems[audio_system]
+    else:
+        capabilities = get_available_audio_systems().get(audio_system)
+    sample_formats = {"Automatic": 0, "16 bit": AV_SAMPLE_FMT_S16}
+    if capabilities is not None and capabilities["float32"]:
+        sample_formats["32 bit float"] = AV_SAMPLE_FMT_FLT
+    return sample_formats
+
+class _AVIOFile:
+    """File object wrapper for reading from FFmpeg I/O callbacks.
+
+    Exceptions cannot propagate through the ctypes callbacks, so errors are
+    reported to FFmpeg as end of file (when reading) or as failed seek.
+
+    Seeking only moves a virtual position, the wrapped file is seeked when
+    data is actually read. If the size of the file is given, seeking relative
+    to the end (which pyglet does to determine the file size) does not touch
+    the wrapped file at all, so compressed album members are not decompressed
+    up front.
+
+    """
+
+    def __init__(self, file, size=None):
+        self._file = file
+        self._size = size
+        self._pos = file.tell()
+
+    def read(self, size):
+        try:
+            if self._file.tell() != self._pos:
+                self._file.seek(self._pos)
+            data = self._file.read(size)
+            self._pos += len(data)
+            return data
+        except Exception:
+            return b""
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        try:
+            if whence == os.SEEK_SET:
+                pos = offset
+            elif whence == os.SEEK_CUR:
+                pos = self._pos + offset
+            elif whence == os.SEEK_END and self._size is not None:
+                pos = self._size + offset
+            else:
+                pos = self._file.seek(offset, whence)
+            if pos < 0:
+                return -1
+            self._pos = pos
+            return pos
+        except Exception:
+            return -1
+
+    def tell(self):
+        return self._pos
 
 
 class FFmpegSource(FFmpegSource):
     """Modified FFmpegSource with some fixes.
 
     Fixes:
-        - Close tempfile after writing it
+        - Open stored album members directly in the album file
+        - Stream other album members through custom I/O callbacks
+        - Fall back to a tempfile, close it after writing it
         - Delete tempfile when object is deleted
         - Allow bit depth to be higher than 16
         - Allow fixing target format
+        - Allow decoding into a given audio format (for gapless playback)
         - Dither (and noise shape) on bit reduction
 
     Original code from the Pyglet project (pyglet.org) is under the following
@@ -297,19 +475,13 @@ class FFmpegSource(FFmpegSource):
                 AV_SAMPLE_FMT_S32: 32, AV_SAMPLE_FMT_S32P: 32,
                 AV_SAMPLE_FMT_FLT: 32, AV_SAMPLE_FMT_FLTP: 32}
 
-    def __init__(self, filename, file=None):
+    def __init__(self, filename, file=None, audio_format=None, sample_rate=0,
+                 channels=0, min_sample_bits=0):
+        # audio_format: decode into this format (overrides everything else)
+        # sample_rate, channels: use these instead of the source's if
+        # automatic
+        # min_sample_bits: decode into at least this many bits if automatic
         self._tempfile = None
-        if file:
-            file.seek(0)
-            if platform.system() == "Windows":
-                self._tempfile = tempfile.NamedTemporaryFile(delete=False)
-            else:
-                self._tempfile = tempfile.NamedTemporaryFile(buffering=False)
-            self._tempfile.write(file.read())
-            filename = self._tempfile.name
-            if platform.system() == "Windows":
-                self._tempfile.close()
-
         self._packet = None
         self._video_stream = None
         self._audio_stream = None
@@ -317,9 +489,7 @@ class FFmpegSource(FFmpegSource):
         self._file = None
         self._memory_file = None
 
-        encoded_filename = filename.encode(sys.getfilesystemencoding())
-
-        self._file = ffmpeg_open_filename(encoded_filename)
+        self._file = self._open(filename, file)
         if not self._file:
             raise FFmpegException('Could not open "{0}"'.format(filename))
 
@@ -374,8 +544,13 @@ class FFmpegSource(FFmpegSource):
 
                 if self.fixed_tgt_channels:
                     tgt_channels = self.fixed_tgt_channels
+                elif channels:
+                    tgt_channels = channels
                 else:
                     tgt_channels = info.channels
+                if audio_format is not None and \
+                        abs(tgt_channels) != audio_format.channels:
+                    tgt_channels = audio_format.channels
 
                 # Try to get the channel layout from the source
                 channel_input = 0
@@ -393,7 +568,7 @@ class FFmpegSource(FFmpegSource):
                 channel_output = self._get_default_channel_layout(
                     channels_out)
 
-                sample_rate = stream.codec_context.contents.sample_rate
+                source_sample_rate = stream.codec_context.contents.sample_rate
                 sample_format = stream.codec_context.contents.sample_fmt
 
                 try:
@@ -401,20 +576,31 @@ class FFmpegSource(FFmpegSource):
                 except Exception:
                     raise FFmpegException('Audio format not supported.')
 
-                if not self.fixed_tgt_format:  # Automatic
+                if audio_format is not None:
+                    if audio_format.sample_size == 8:
+                        self.tgt_format = AV_SAMPLE_FMT_U8
+                    elif audio_format.sample_size == 16:
+                        self.tgt_format = AV_SAMPLE_FMT_S16
+                    elif audio_format.sample_type == "float":
+                        self.tgt_format = AV_SAMPLE_FMT_FLT
+                    else:
+                        self.tgt_format = AV_SAMPLE_FMT_S32
+                elif not self.fixed_tgt_format:  # Automatic
                     d = pyglet.media.get_audio_driver()
                     audio_system = type(d).__name__.replace("Driver", "")
+                    capabilities = get_audio_system(audio_system) or \
+                        {"int32": False, "float32": False}
                     if sample_format in (AV_SAMPLE_FMT_FLT,
                                          AV_SAMPLE_FMT_FLTP):
-                        if AVAILABLE_AUDIO_SYSTEMS[audio_system]["float32"]:
+                        if capabilities["float32"]:
                             self.tgt_format = AV_SAMPLE_FMT_FLT
                         else:
                             self.tgt_format = AV_SAMPLE_FMT_S16
                     elif sample_format in (AV_SAMPLE_FMT_S32,
                                            AV_SAMPLE_FMT_S32P):
-                        if AVAILABLE_AUDIO_SYSTEMS[audio_system]["int32"]:
+                        if capabilities["int32"]:
                             self.tgt_format = AV_SAMPLE_FMT_S32
-                        elif AVAILABLE_AUDIO_SYSTEMS[audio_system]["float32"]:
+                        elif capabilities["float32"]:
                             self.tgt_format = AV_SAMPLE_FMT_FLT
                         else:
                             self.tgt_format = AV_SAMPLE_FMT_S16
@@ -426,9 +612,20 @@ class FFmpegSource(FFmpegSource):
                     self.tgt_format = self.fixed_tgt_format
                 else:
                     raise FFmpegException('Audio format not supported.')
-
-                if self.fixed_tgt_sample_rate:
+                if audio_format is None and not self.fixed_tgt_format and \
+                        min_sample_bits > self._AV_BITS[self.tgt_format]:
+                    # Other tracks (played gaplessly) need more bits
+                    if capabilities["int32"]:
+                        self.tgt_format = AV_SAMPLE_FMT_S32
+                    elif capabilities["float32"]:
+                        self.tgt_format = AV_SAMPLE_FMT_FLT
+
+                if audio_format is not None:
+                    self.tgt_sample_rate = audio_format.sample_rate
+                elif self.fixed_tgt_sample_rate:
                     self.tgt_sample_rate = self.fixed_tgt_sample_rate
+                elif sample_rate:
+                    self.tgt_sample_rate = sample_rate
                 else:
                     self.tgt_sample_rate = info.sample_rate
 
@@ -442,7 +639,8 @@ class FFmpegSource(FFmpegSource):
                     self.audio_format.sample_type = "int"
 
                 self.audio_convert_ctx = self.get_formatted_swr_context(
-                    channel_output, sample_rate, channel_input, sample_format)
+                    channel_output, source_sample_rate, channel_input,
+                    sample_format)
 
                 if (self._AV_BITS[self.tgt_format] < sample_bits):
                         res = avutil.av_opt_set(self.audio_convert_ctx,
@@ -594,6 +792,42 @@ class FFmpegSource(FFmpegSource):
         if platform.system() == "Windows" and self._tempfile:
             os.remove(self._tempfile.name)
 
+    def _open(self, filename, file):
+        if file:
+            # Stored album members are opened in place with FFmpeg's subfile
+            # protocol, everything else is read on demand through an AVIO
+            # context; only if both fail, it is copied into a temporary file
+            byte_range = getattr(file, "byte_range", None)
+            if byte_range is not None:
+                path, offset, size = byte_range
+                url = f"subfile,,start,{offset},end,{offset + size},,:" \
+                      f"file:{path}"
+                try:
+                    return ffmpeg_open_filename(
+                        url.encode(sys.getfilesystemencoding()))
+                except Exception:
+                    pass
+            try:
+                file.seek(0)
+                ffmpeg_file, self._memory_file = ffmpeg_open_memory_file(
+                    filename.encode(sys.getfilesystemencoding()),
+                    _AVIOFile(file, getattr(file, "file_size", None)))
+                return ffmpeg_file
+            except Exception:
+                self._memory_file = None
+            file.seek(0)
+            if platform.system() == "Windows":
+                self._tempfile = tempfile.NamedTemporaryFile(delete=False)
+            else:
+                self._tempfile = tempfile.NamedTemporaryFile(buffering=False)
+            self._tempfile.write(file.read())
+            filename = self._tempfile.name
+            if platform.system() == "Windows":
+                self._tempfile.close()
+
+        encoded_filename = filename.encode(sys.getfilesystemencoding())
+        return ffmpeg_open_filename(encoded_filename)
+
     def get_formatted_swr_context(self, channel_output: AVChannelLayout | int,
                                   sample_rate: int,
                                   channel_input: AVChannelLayout | int,
@@ -626,6 +860,180 @@ class FFmpegDecoder(FFmpegDecoder):
         return FFmpegSource(file, filename)
 
 
+_pcm_cache = collections.OrderedDict()
+_pcm_cache_size = 0
+_pcm_cache_lock = threading.Lock()
+
+
+class _PCMEntry:
+    """Decoded audio of a track (incomplete while it is being decoded)."""
+
+    def __init__(self, source):
+        self.audio_format = source.audio_format
+        self.duration = source.duration
+        self.info = source.info
+        self.data = bytearray()
+        self.complete = False
+
+
+def _get_pcm_entry(key):
+    with _pcm_cache_lock:
+        entry = _pcm_cache.get(key)
+        if entry is not None:
+            _pcm_cache.move_to_end(key)
+        return entry
+
+def _add_pcm_entry(key, entry):
+    global _pcm_cache_size
+    with _pcm_cache_lock:
+        old_entry = _pcm_cache.pop(key, None)
+        if old_entry is not None:
+            _pcm_cache_size -= len(old_entry.data)
+        _pcm_cache[key] = entry
+
+def _remove_pcm_entry(key, entry):
+    global _pcm_cache_size
+    with _pcm_cache_lock:
+        if _pcm_cache.get(key) is entry:
+            _pcm_cache_size -= len(_pcm_cache.pop(key).data)
+
+def _append_pcm(key, entry, data):
+    # Returns whether the data was added (i.e. fits into the budget)
+    global _pcm_cache_size
+    with _pcm_cache_lock:
+        if _pcm_cache.get(key) is not entry or \
+                len(entry.data) + len(data) > PCM_CACHE_SIZE:
+            return False
+        entry.data += data
+        _pcm_cache_size += len(data)
+        while _pcm_cache_size > PCM_CACHE_SIZE:
+            old_key = next(iter(_pcm_cache))
+            if old_key == key:
+                _pcm_cache.move_to_end(key)
+                old_key = next(iter(_pcm_cache))
+            _pcm_cache_size -= len(_pcm_cache.pop(old_key).data)
+        return True
+
+def clear_pcm_cache():
+    """Remove all decoded audio from the cache."""
+
+    global _pcm_cache_size
+    with _pcm_cache_lock:
+        _pcm_cache.clear()
+        _pcm_cache_size = 0
+
+
+class _CachedSource(StreamingSource):
+    """A source serving decoded audio from the PCM cache.
+
+    If the whole track is in the cache, it is served from memory, without
+    FFmpeg, and its file object is closed right away. Otherwise the track is
+    decoded with FFmpegSource, and while that decodes sequentially from the
+    beginning of the track, its output is added to the cache. As seeking in
+    FFmpeg is not sample-exact, the entry is dropped when decoding stops
+    before the end of the track (seeking beyond the decoded audio, deleting
+    the source early, or running out of budget), so that only complete
+    tracks are served from the cache.
+
+    """
+
+    def __init__(self, track, key, kwargs):
+        self._track = track
+        self._key = key
+        self._source = None
+        self._source_pos = 0  # position of the source in bytes
+        self._filling = False  # whether the source decodes into the entry
+        self._pos = 0
+        self._entry = _get_pcm_entry(key)
+        if self._entry is None or not self._entry.complete:
+            self._source = FFmpegSource(track.name, track, **kwargs)
+            self._filling = True
+            self._entry = _PCMEntry(self._source)
+            _add_pcm_entry(key, self._entry)
+        else:
+            self._close_track()
+        self.audio_format = self._entry.audio_format
+        self.info = self._entry.info
+        self._duration = self._entry.duration
+
+    def _close_track(self):
+        try:
+            self._track.close()
+        except Exception:
+            pass
+        self._track = None
+
+    def _stop_filling(self):
+        if self._filling:
+            self._filling = False
+            _remove_pcm_entry(self._key, self._entry)
+
+    def seek(self, timestamp):
+        self._pos = self.audio_format.timestamp_to_bytes_aligned(
+            max(0.0, timestamp))
+        if self._pos > len(self._entry.data) and not self._entry.complete:
+            self._stop_filling()
+            self._source.seek(timestamp)
+            self._source_pos = self._pos
+
+    def get_audio_data(self, num_bytes, compensation_time=0.0):
+        cached = len(self._entry.data)
+        if self._pos < cached:
+            size = self.audio_format.align(min(num_bytes, cached - self._pos))
+            data = bytes(self._entry.data[self._pos:self._pos + size])
+            self._pos += len(data)
+            return AudioData(data, len(data))
+        if self._entry.complete:
+            return None
+
+        if self._source_pos != self._pos:
+            # Only after seeking back into the cache while not filling it
+            self._source.seek(self._pos / self.audio_format.bytes_per_second)
+            self._source_pos = self._pos
+        audio_data = self._source.get_audio_data(num_bytes)
+        if audio_data is None:
+            if self._filling:
+                self._entry.complete = True
+                self._filling = False
+            return None
+        data = audio_data.data[:audio_data.length]
+        if self._filling and not _append_pcm(self._key, self._entry, data):
+            self._stop_filling()
+        self._source_pos += len(data)
+        self._pos += len(data)
+        return audio_data
+
+    def delete(self):
+        self._stop_filling()
+        if self._source is not None:
+            self._source.delete()
+            self._source = None
+        if self._track is not None:
+            self._close_track()
+
+
+def _open_source(track, **kwargs):
+    # Open a track for decoding with FFmpegSource (see there for the keyword
+    # arguments), through the PCM cache if possible
+    key = getattr(track, "cache_key", None)
+    if not PCM_CACHE or key is None:
+        return FFmpegSource(track.name, track, **kwargs)
+    audio_format = kwargs.get("audio_format")
+    if audio_format is not None:
+        audio_format = (audio_format.channels, audio_format.sample_size,
+                        audio_format.sample_rate, audio_format.sample_type)
+    output = (type(pyglet.media.get_audio_driver()).__name__,
+              FFmpegSource.fixed_tgt_format,
+              FFmpegSource.fixed_tgt_sample_rate,
+              FFmpegSource.fixed_tgt_channels,
+              FFmpegSource.hq_resampling,
+              audio_format,
+              kwargs.get("sample_rate", 0),
+              kwargs.get("channels", 0),
+              kwargs.get("min_sample_bits", 0))
+    return _CachedSource(track, (key, output), kwargs)
+
+
 class AudioPlayer:
     """A class implementing an audio player.
 
@@ -633,14 +1041,6 @@ class AudioPlayer:
 
     """
 
-    available_audio_systems = AVAILABLE_AUDIO_SYSTEMS
-    available_sample_formats = {}
-    for system in AVAILABLE_AUDIO_SYSTEMS:
-        d = {"Automatic": 0, "16 bit": AV_SAMPLE_FMT_S16}
-        if AVAILABLE_AUDIO_SYSTEMS[system]["float32"]:
-            d["32 bit float"] = AV_SAMPLE_FMT_FLT
-        available_sample_formats[system] = d
-
     def __init__(self, audio_system, sample_format, sample_rate, channel_mode,
                  hq_resampling):
         """Create an AudioPlayer object.
@@ -664,13 +1064,16 @@ class AudioPlayer:
 
         """
 
-        audio_driver = self.available_audio_systems[audio_system]["driver"]
+        capabilities = get_audio_system(audio_system)
+        if capabilities is None:
+            raise ValueError(f"Audio system not available: {audio_system}")
+        audio_driver = capabilities["driver"]
         module = __import__(f"pyglet.media.drivers.{audio_driver}",
                             fromlist=['create_audio_driver'])
         pyglet.media.drivers._audio_driver = module.create_audio_driver()
 
         FFmpegSource.fixed_tgt_format = \
-            self.available_sample_formats[audio_system][sample_format]
+            get_sample_formats(audio_system)[sample_format]
         FFmpegSource.fixed_tgt_sample_rate = 0
         if sample_rate != "Automatic":
             FFmpegSource.fixed_tgt_sample_rate = int(sample_rate.split(" ")[0])
@@ -804,9 +1207,7 @@ class AudioPlayer:
             self.clear()
             self.clear_on_queue = False
         for track in tracks:
-            source = pyglet.media.load(track.name, file=track,
-                                       decoder=FFmpegDecoder())
-            self._player.queue(source)
+            self._player.queue(_open_source(track))
 
     def seek(self, time):
         """Seek to a certain point in time.
@@ -838,32 +1239,182 @@ class AudioPlayer:
                     self._on_eos()
 
 
-class SourceGroup(pyglet.media.SourceGroup):
-    """Enhanced SourceGroup with some additions."""
+class GaplessSource(pyglet.media.Source):
+    """A source concatenating tracks sample-exactly for gapless playback.
+
+    All tracks are decoded into one common audio format, which is set by the
+    first track (and the format hints, which should cover all tracks), so
+    that tracks with different sample rates, sample formats or codecs can be
+    played back to back. Tracks are opened (and start decoding) as soon as
+    they are added. The start of each track in the output stream is recorded
+    in samples, when reading reaches it.
+
+    The first track in the list is the one being played; it is only removed
+    (by calling `advance`) when playback has reached the start of the next
+    one. Reading can be ahead of playback by up to the buffer size of the
+    audio driver. If reading runs out of tracks, the audio driver stops
+    reading; the source is then `exhausted` until it is seeked.
+
+    """
+
+    def __init__(self, sample_rate=0, channels=0, sample_bits=0):
+        """Create a GaplessSource object.
+
+        Parameters
+        ----------
+        sample_rate : int, optional
+            the sample rate to decode into if automatic (0 for that of the
+            first track)
+        channels : int, optional
+            the number of channels to decode into if automatic (0 for that of
+            the first track)
+        sample_bits : int, optional
+            the minimum number of bits per sample to decode into if automatic
+            (0 for that of the first track)
 
-    def __init__(self):
-        super().__init__()
-        self._advanced = False
-        self._advance_callback = None
+        """
+
+        self.audio_format = None
+        self.video_format = None
+        self.info = None
+        self.is_player_source = False
+        self._sample_rate = sample_rate
+        self._channels = channels
+        self._sample_bits = sample_bits
+        self._tracks = []  # [source, start in samples (None if not read)]
+        self._reading = 0  # index of the track being read
+        self._samples = 0  # number of samples in the output stream so far
+        self._exhausted = False
+        self._lock = threading.RLock()
 
     @property
-    def advance_callback(self):
-        return self._advance_callback
+    def duration(self):
+        with self._lock:
+            if self._tracks:
+                return self._tracks[0][0].duration
+            return 0.0
 
-    @advance_callback.setter
-    def advance_callback(self, value):
-        if callable(value):
-            self._advance_callback = value
+    @property
+    def nr_of_tracks(self):
+        return len(self._tracks)
 
-    def _advance(self):
-        super()._advance()
-        self._advanced = True
+    @property
+    def exhausted(self):
+        return self._exhausted
+
+    def add(self, track):
+        """Add a track.
+
+        Parameters
+        ----------
+        track : zipfile.ZipExtFile object
+            the track to add
+
+        """
+
+        if self.audio_format is None:
+            source = _open_source(track, sample_rate=self._sample_rate,
+                                  channels=self._channels,
+                                  min_sample_bits=self._sample_bits)
+        else:
+            source = _open_source(track, audio_format=self.audio_format)
+        with self._lock:
+            if self.audio_format is None:
+                self.audio_format = source.audio_format
+                self.info = source.info
+            start = 0 if not self._tracks else None
+            if self._tracks and self._reading == len(self._tracks):
+                start = self._samples  # reading had run out of tracks
+            self._tracks.append([source, start])
+
+    def get_track_start(self, nr):
+        """Return the start of a track in the output stream.
+
+        Parameters
+        ----------
+        nr : int
+            the index of the track (0 is the track being played)
+
+        Returns
+        -------
+        start : float or None
+            the start of the track in seconds (None if not reached yet)
+
+        """
+
+        with self._lock:
+            if nr < len(self._tracks) and self._tracks[nr][1] is not None:
+                return self._tracks[nr][1] / self.audio_format.sample_rate
+
+    def get_end(self):
+        """Return the end of the output stream.
+
+        Returns
+        -------
+        end : float or None
+            the end of the last track in seconds (None if not reached yet)
+
+        """
+
+        with self._lock:
+            if self._tracks and self._reading == len(self._tracks):
+                return self._samples / self.audio_format.sample_rate
+
+    def advance(self):
+        """Remove the track being played."""
+
+        with self._lock:
+            if self._tracks:
+                source = self._tracks.pop(0)[0]
+                self._reading = max(0, self._reading - 1)
+                source.delete()
+
+    def seek(self, timestamp):
+        with self._lock:
+            if not self._tracks:
+                return
+            self._tracks[0][0].seek(timestamp)
+            for track in self._tracks[1:]:
+                if track[1] is not None:
+                    track[0].seek(0.0)
+                track[1] = None
+            self._tracks[0][1] = 0
+            self._reading = 0
+            self._samples = round(timestamp * self.audio_format.sample_rate)
+            self._exhausted = False
+
+    def get_audio_data(self, num_bytes, compensation_time=0.0):
+        with self._lock:
+            buffer = b""
+            bytes_per_frame = self.audio_format.bytes_per_frame
+            while len(buffer) < num_bytes and \
+                    self._reading < len(self._tracks):
+                audio_data = self._tracks[self._reading][0].get_audio_data(
+                    num_bytes - len(buffer))
+                if audio_data:
+                    data = audio_data.data[:audio_data.length]
+                    buffer += data
+                    self._samples += len(data) // bytes_per_frame
+                else:
+                    self._reading += 1
+                    if self._reading < len(self._tracks):
+                        self._tracks[self._reading][1] = self._samples
+            if not buffer:
+                self._exhausted = True
+                return None
+            return AudioData(buffer, len(buffer))
+
+    def delete(self):
+        with self._lock:
+            for track in self._tracks:
+                track[0].delete()
+            self._tracks = []
 
 
 class GaplessAudioPlayer(AudioPlayer):
     """A class implementing a gapless audio player.
 
-    This is a wrapper around pyglet.media.Player and pyglet.media.SourceGroup.
+    This is a wrapper around pyglet.media.Player and a GaplessSource.
 
     """
 
@@ -893,6 +1444,7 @@ class GaplessAudioPlayer(AudioPlayer):
         super().__init__(audio_system, sample_format, sample_rate,
                          channel_mode, hq_resampling)
         self._on_gapless_eos = None
+        self._stream_format = (0, 0, 0)
         self.clear()
 
     @property
@@ -906,15 +1458,36 @@ class GaplessAudioPlayer(AudioPlayer):
 
     @property
     def queue_is_empty(self):
-        return self._sourcegroup._sources == []
+        return self._source.nr_of_tracks == 0
+
+    def set_stream_format(self, sample_rate=0, channels=0, sample_bits=0):
+        """Set the format to decode all tracks into (if automatic).
+
+        This takes effect with the next cleared queue.
+
+        Parameters
+        ----------
+        sample_rate : int, optional
+            the sample rate (0 for that of the first track)
+        channels : int, optional
+            the number of channels (0 for that of the first track)
+        sample_bits : int, optional
+            the minimum number of bits per sample (0 for that of the first
+            track)
+
+        """
+
+        self._stream_format = (sample_rate, channels, sample_bits)
 
     def clear(self):
         """Clear the queue."""
 
         super().clear()
-        self._sourcegroup = SourceGroup()
-        self._player.queue(self._sourcegroup)
-        self._current_duration = None
+        if hasattr(self, "_source"):
+            self._source.delete()
+        self._source = GaplessSource(*self._stream_format)
+        self._player.queue(self._source)
+        self.offset = 0
 
     def queue(self, tracks):
         """Fill the play queue.
@@ -931,12 +1504,8 @@ class GaplessAudioPlayer(AudioPlayer):
         if self.clear_on_queue:
             self.clear()
             self.clear_on_queue = False
-        was_empty = len(self._sourcegroup._sources) == 0
         for track in tracks:
-            self._sourcegroup.add(pyglet.media.load(track.name, file=track,
-                                                    decoder=FFmpegDecoder()))
-        if was_empty:
-            self._current_duration = self._sourcegroup._sources[0].duration
+            self._source.add(track)
 
     def seek(self, time):
         """Seek to a certain point in time.
@@ -948,31 +1517,323 @@ class GaplessAudioPlayer(AudioPlayer):
 
         """
 
-        if self._sourcegroup._advanced:
-            return
-        if self._current_duration is not None:
-            if time > self._current_duration - 0.2:
-                time = self._current_duration - 0.2
-            if self.time < self._current_duration - 0.2:
-                super().seek(time)
-                self.offset = 0
+        if self._source.nr_of_tracks > 0:
+            super().seek(time)
+            self.offset = 0
 
     def update(self):
         """Update the audio player."""
 
-        if self._sourcegroup._sources != []:
-            if self._current_duration is not None:
-                if self._sourcegroup._advanced:
-                    self._sourcegroup._advanced = False
-                    self._on_gapless_eos()
-                if self.time > self._current_duration:
-                    if len(self._sourcegroup._sources) > 0:
-                        self.offset += self._current_duration
-                        #self._player._timer.set_time(self.time - \
-                                                     #self._current_duration)
-                        self._current_duration = \
-                            self._sourcegroup._sources[0].duration
-                    else:
-                        self._current_duration = None
+        if self._source.nr_of_tracks == 0:
+            return
+        player_time = self._player.time
+        next_start = self._source.get_track_start(1)
+        if next_start is not None and player_time >= next_start:
+            self._source.advance()
+            if self._source.exhausted:
+                # The next track was added only after the source had run dry
+                # and the audio driver had stopped reading, so restart
+                # playback with it
+                self.seek(0.0)
+            else:
+                self.offset = next_start
+            if self._on_gapless_eos is not None:
+                self._on_gapless_eos()
         else:
-            self._on_eos()
+            end = self._source.get_end()
+            if end is not None and player_time >= end:
+                if self._on_eos is not None:
+                    self._on_eos()
+
+
+class AudioEngine:
+    """A class implementing an audio engine running on its own thread.
+
+    The audio player is created, controlled and updated on the engine thread,
+    so that end of track detection and gapless bookkeeping happen on time,
+    regardless of how busy the GUI is. Commands are executed in the order
+    they were given. End of track events are put into the `events` queue as
+    tuples of event name ("eos" or "gapless_eos"), the (monotonic) time the
+    event occurred at, and the generation of the last command executed
+    before it; events whose generation differs from `generation` were
+    overtaken by a later command. The playback state (`is_playing`, `time`
+    and `buffer_time`) is published by the engine thread, so reading it never
+    waits for the engine; neither does reading `volume` and `clear_on_queue`,
+    which reflect values set but not yet applied by the engine.
+
+    On macOS, the audio player (and hence the pyglet driver) is created on
+    the calling thread, which should be the main thread.
+
+    """
+
+    def __init__(self, gapless, audio_system, sample_format, sample_rate,
+                 channel_mode, hq_resampling):
+        """Create an AudioEngine object.
+
+        Parameters
+        ----------
+        gapless : bool
+            whether to use a GaplessAudioPlayer (instead of an AudioPlayer)
+        audio_system : str
+            the pyglet audio driver to use (see AudioPlayer)
+        sample_format : str
+            the FFmpeg output format to use (see AudioPlayer)
+        sample_rate : str
+            the FFmpeg sample rate to use (see AudioPlayer)
+        channel_mode : str
+            the FFmpeg output channel mode to use (see AudioPlayer)
+        hq_resampling : bool
+            whether to use hiqh-quality resampling
+
+        """
+
+        self._gapless = gapless
+        self._player = None
+        self._eos_pending = False
+        self._closed = False
+        self._generation = 0
+        self._executed_generation = 0
+        self._sequence = 0  # number of calls given (commands or not)
+        self._executed_sequence = 0
+        self._state = {"is_playing": False, "time": 0.0,
+                       "buffer_time": None, "volume": 1.0,
+                       "clear_on_queue": True, "sequence": 0}
+        self._pending = {}  # values set, but maybe not yet published
+        self._commands = queue.Queue()
+        self.events = queue.Queue()
+        args = (audio_system, sample_format, sample_rate, channel_mode,
+                hq_resampling)
+        if platform.system() == "Darwin":
+            # pyglet must not touch Cocoa outside of the main thread
+            self._create_player(*args)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if platform.system() != "Darwin":
+            try:
+                self._call(self._create_player, *args).result()
+            except Exception:
+                self.close()
+                raise
+
+    def set_stream_format(self, sample_rate=0, channels=0, sample_bits=0):
+        """Set the format to decode all tracks into (gapless only).
+
+        Parameters
+        ----------
+        sample_rate : int, optional
+            the sample rate (0 for that of the first track)
+        channels : int, optional
+            the number of channels (0 for that of the first track)
+        sample_bits : int, optional
+            the minimum number of bits per sample (0 for that of the first
+            track)
+
+        """
+
+        if self._gapless:
+            self._call(self._player.set_stream_format, sample_rate, channels,
+                       sample_bits)
+
+    def _create_player(self, *args):
+        if self._gapless:
+            self._player = GaplessAudioPlayer(*args)
+            self._player.eos_gapless_callback = \
+                lambda: self.events.put(("gapless_eos", time.monotonic(),
+                                         self._executed_generation))
+        else:
+            self._player = AudioPlayer(*args)
+        self._player.eos_callback = self._on_eos
+        self._publish_state()
+
+    def _on_eos(self):
+        # The player keeps reporting the end of the stream until it gets a
+        # new command, but the GUI only needs to know once
+        if not self._eos_pending:
+            self._eos_pending = True
+            self.events.put(("eos", time.monotonic(),
+                             self._executed_generation))
+
+    def _call(self, func, *args, command=True):
+        future = concurrent.futures.Future()
+        if self._closed:
+            future.cancel()
+        else:
+            if command:
+                self._generation += 1
+                generation = self._generation
+            else:
+                generation = None
+            self._sequence += 1
+            self._commands.put((future, func, args, generation,
+                                self._sequence))
+        return future
+
+    def _set(self, name, value, command=True):
+        # Set an attribute of the player, and remember the value until the
+        # engine has published the state after setting it
+        self._call(setattr, self._player, name, value, command=command)
+        self._pending[name] = (self._sequence, value)
+
+    def _get_state(self, name):
+        state = self._state
+        if name in self._pending:
+            sequence, value = self._pending[name]
+            if sequence > state["sequence"]:
+                return value
+        return state[name]
+
+    def _run(self):
+        while True:
+            try:
+                future, func, args, generation, sequence = \
+                    self._commands.get(timeout=ENGINE_INTERVALL)
+                if func is None:
+                    break
+                self._executed_sequence = sequence
+                if generation is not None:
+                    self._eos_pending = False
+                    self._executed_generation = generation
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            except queue.Empty:
+                pass
+            try:
+                if self._player is not None and not self._eos_pending and \
+                        self._player.is_playing:
+                    self._player.update()
+            except Exception:
+                pass
+            self._publish_state()
+        if self._player is not None:
+            self._player.pause()
+        self._player = None
+
+    def _publish_state(self):
+        if self._player is None:
+            return
+        try:
+            is_playing = self._player.is_playing
+            buffer_time = self._player.buffer_time if is_playing else None
+            self._state = {"is_playing": is_playing,
+                           "time": self._player.time,
+                           "buffer_time": buffer_time,
+                           "volume": self._player.volume,
+                           "clear_on_queue": self._player.clear_on_queue,
+                           "sequence": self._executed_sequence}
+        except Exception:
+            pass
+
+    @property
+    def gapless(self):
+        return self._gapless
+
+    @property
+    def generation(self):
+        return self._generation
+
+    @property
+    def audio_system(self):
+        return self._player.audio_system
+
+    @property
+    def sample_format(self):
+        return self._player.sample_format
+
+    @property
+    def sample_rate(self):
+        return self._player.sample_rate
+
+    @property
+    def channel_mode(self):
+        return self._player.channel_mode
+
+    @property
+    def hq_resampling(self):
+        return self._player.hq_resampling
+
+    @property
+    def is_playing(self):
+        return self._get_state("is_playing")
+
+    @property
+    def buffer_time(self):
+        return self._get_state("buffer_time")
+
+    @property
+    def time(self):
+        return self._get_state("time")
+
+    @property
+    def volume(self):
+        return self._get_state("volume")
+
+    @volume.setter
+    def volume(self, value):
+        self._set("volume", value, command=False)
+
+    @property
+    def clear_on_queue(self):
+        return self._get_state("clear_on_queue")
+
+    @clear_on_queue.setter
+    def clear_on_queue(self, value):
+        self._set("clear_on_queue", value)
+
+    def play(self):
+        """Start playback."""
+
+        self._call(self._player.play)
+
+    def pause(self):
+        """Pause playback."""
+
+        self._call(self._player.pause)
+
+    def clear(self):
+        """Clear the queue."""
+
+        self._call(self._player.clear)
+
+    def queue(self, tracks):
+        """Fill the play queue.
+
+        Parameters
+        ----------
+        tracks : list of zipfile.ZipExtFile objects
+            the tracks to fill the queue
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+            the future of the command (raising any error of queuing)
+
+        """
+
+        return self._call(self._player.queue, tracks)
+
+    def seek(self, time):
+        """Seek to a certain point in time.
+
+        Parameters
+        ----------
+        time : float
+            the point in time to seek to (in seconds)
+
+        """
+
+        self._call(self._player.seek, time)
+
+    def close(self):
+        """Stop the engine thread and release the audio player.
+
+        Waits at most `ENGINE_CLOSE_TIMEOUT` seconds for the engine thread.
+
+        """
+
+        if not self._closed:
+            self._closed = True
+            self._commands.put((None, None, None, None, None))
+            if threading.current_thread() is not self._thread:
+                self._thread.join(ENGINE_CLOSE_TIMEOUT)
@@ -0,0 +1,98 @@
+import sys
+import time
+import builtins
+
+
+STARTUP_BUDGET = 1.0  # maximal time until the main window is shown (in s)
+
+_start = None
+_marks = []
+_import_times = {}
+_original_import = None
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+    package = name.split(".")[0]
+    if level != 0 or package in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _import_times[package] = _import_times.get(package, 0) + \
+            time.perf_counter() - start
+
+def start():
+    """Start profiling the startup.
+
+    From now on, the (cumulative) time of first importing each top-level
+    package is measured, and calls to `mark` are recorded.
+
+    """
+
+    global _start, _original_import
+    if _start is None:
+        _start = time.perf_counter()
+        _original_import = builtins.__import__
+        builtins.__import__ = _profiled_import
+
+def is_active():
+    """Return whether the startup is being profiled."""
+
+    return _start is not None
+
+def mark(name):
+    """Record the time of a startup event (if profiling).
+
+    Parameters
+    ----------
+    name : str
+        the name of the event
+
+    """
+
+    if _start is not None:
+        _marks.append((name, time.perf_counter() - _start))
+
+def report(file=None, top=15):
+    """Stop profiling and print a report.
+
+    Parameters
+    ----------
+    file : file-like object, optional
+        the file to print the report to (default: sys.stderr)
+    top : int, optional
+        the number of slowest imports to list
+
+    """
+
+    global _start
+    if _start is None:
+        return
+    if builtins.__import__ is _profiled_import:
+        builtins.__import__ = _original_import
+    if file is None:
+        file = sys.stderr
+
+    print("Import profile (cumulative time of first import):", file=file)
+    imports = sorted(_import_times.items(), key=lambda x: x[1], reverse=True)
+    for package, seconds in imports[:top]:
+        print(f"  {seconds * 1000:8.1f} ms  {package}", file=file)
+    print("Startup events:", file=file)
+    for name, seconds in _marks:
+        print(f"  {seconds * 1000:8.1f} ms  {name}", file=file)
+    for name, seconds in _marks:
+        if name == "first window":
+            status = "OK" if seconds <= STARTUP_BUDGET else "OVER BUDGET"
+            print(f"Time to first window: {seconds:.3f} s "
+                  f"(budget: {STARTUP_BUDGET:.3f} s) {status}", file=file)
+            break
+    # Interactive means that an album given on the command line can be
+    # played (or, without one, that the audio engine is ready)
+    marks = dict(_marks)
+    for name in ("album playable", "audio engine ready"):
+        if name in marks:
+            print(f"Time to interactive: {marks[name]:.3f} s ({name})",
+                  file=file)
+            break
+    _start = None
@@ -1,7 +1,11 @@
+import sys
 from multiprocessing import freeze_support
 
 
 def run():
+    if "--import-profile" in sys.argv:
+        from zap import profiling
+        profiling.start()
     from zap.zap import run as run_zap
     run_zap()
 
@@ -1,9 +1,11 @@
 import os
+import re
 import sys
 import shutil
 import colorsys
 import platform
 import tempfile
+import datetime
 import textwrap
 import subprocess
 
@@ -14,10 +16,27 @@ from tkinter import font as tkfont
 def safely_import_tkinterdnd2():
     """Check if tkinterdnd2 can be fully initialized.
 
-    Returns the tkinterdnd2 module if safe, else None.
+    Returns the tkinterdnd2 module if safe, else None. The result of the
+    check is cached across sessions, as long as the Python executable,
+    tkinterdnd2 and the display stay unchanged.
 
     """
 
+    from .cache import get_file_signature, get_cached_probe, set_cached_probe
+    import importlib.util
+    try:
+        tkinterdnd2_path = importlib.util.find_spec("tkinterdnd2").origin
+    except Exception:
+        tkinterdnd2_path = None
+    key = [sys.executable, tk.TkVersion, _get_display_environment()] + \
+        get_file_signature(tkinterdnd2_path)
+    safe = get_cached_probe("tkinterdnd2", key)
+    if safe is not None:
+        if safe:
+            import tkinterdnd2
+            return tkinterdnd2
+        return None
+
     check_code = """
 import sys
 try:
@@ -37,6 +56,7 @@ except Exception as e:
             timeout=5 # Prevent hanging on some Intel Mac builds
         )
 
+        set_cached_probe("tkinterdnd2", key, result.returncode == 0)
         if result.returncode == 0:
             import tkinterdnd2
             return tkinterdnd2
@@ -44,6 +64,11 @@ except Exception as e:
         pass
     return None
 
+def _get_display_environment():
+    return [os.environ.get(x) for x in ("DISPLAY", "WAYLAND_DISPLAY",
+                                        "XDG_SESSION_ID",
+                                        "XDG_CURRENT_DESKTOP")]
+
 def get_linux_scaling():
     scaling = 1
     if "GDK_SCALE" in os.environ:
@@ -55,6 +80,15 @@ def get_linux_scaling():
         except Exception:
             pass
     else:
+        # The result of querying the X resources is cached for the display
+        # session
+        from .cache import (get_file_signature, get_cached_probe,
+                            set_cached_probe)
+        key = _get_display_environment() + get_file_signature(
+            os.path.expanduser("~/.Xresources"))
+        cached = get_cached_probe("linux_scaling", key)
+        if cached is not None:
+            return cached
         try:
             output = subprocess.check_output("xrdb -query", shell=True,
                                              text=True,
@@ -65,6 +99,7 @@ def get_linux_scaling():
                     font_ratio = system_dpi / 96.0
                     if font_ratio != 1.0:
                         scaling = font_ratio
+            set_cached_probe("linux_scaling", key, scaling)
         except Exception:
             pass
     return scaling
@@ -77,6 +112,46 @@ def get_hex_colour(rgb, brightness=None):
         colour = f"#{r:02X}{g:02X}{b:02X}"
         return colour
 
+_ISO_DATE = re.compile(r"\s*(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?(?:[T ].*)?\s*$")
+
+def parse_year(text):
+    """Return the year of a date string.
+
+    Common forms (YYYY, YYYY-MM, YYYY-MM-DD, optionally followed by a time)
+    are parsed directly, everything else with dateutil.
+
+    Parameters
+    ----------
+    text : str
+        the date string
+
+    Returns
+    -------
+    year : int
+        the year
+
+    Raises
+    ------
+    ValueError
+        if the date string cannot be parsed
+
+    """
+
+    match = _ISO_DATE.match(text)
+    if match is not None:
+        year, month, day = match.groups()
+        try:
+            datetime.date(int(year), int(month or 1), int(day or 1))
+            return int(year)
+        except ValueError:
+            pass
+
+    import dateutil.parser
+    try:
+        return dateutil.parser.parse(text).year
+    except (ValueError, OverflowError) as e:
+        raise ValueError(f"Unknown date format: {text}") from e
+
 def is_venv():
     """Return if running in a virtual environment.
 
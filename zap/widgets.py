@@ -1,6 +1,5 @@
 import io
 import platform
-import dateutil
 
 import tkinter as tk
 import tkinter.ttk as ttk
@@ -8,7 +7,7 @@ import tkinter.ttk as ttk
 from PIL import Image, ImageTk
 from PIL import __version__ as pil_version
 
-from .utils import get_hex_colour, FontBase
+from .utils import get_hex_colour, parse_year, FontBase
 
 
 class AutoScrollbar(ttk.Scrollbar):
@@ -187,7 +186,7 @@ class TrackTooltip:
         if track["pictures"] != []:
             im = Image.open(io.BytesIO(track["pictures"][0].data))
         else:
-            im = Image.open(self.album.get_slide(0))
+            im = Image.open(self.album.get_slide(0, size=100))
         if int(pil_version.split(".")[0]) < 10:
             im = im.resize((100, 100), Image.ANTIALIAS)
         else:
@@ -227,11 +226,11 @@ class TrackTooltip:
         label.grid(row=1, column= 0, padx=2, ipadx=0, ipady=0, sticky="nw")
         try:
             try:
-                year = "; ".join([str(dateutil.parser.parse(x).year) \
+                year = "; ".join([str(parse_year(x)) \
                                   for x in track["tags"]["date"]])
             except KeyError as e:
                 if self.album._fix_date:
-                    year = "; ".join([str(dateutil.parser.parse(x).year) \
+                    year = "; ".join([str(parse_year(x)) \
                                       for x in track["tags"]["year"]])
                 else:
                     raise e
@@ -20,6 +20,7 @@ import colorsys
 import platform
 import threading
 import configparser
+import concurrent.futures
 
 try:
     import tkinter as tk
@@ -37,13 +38,16 @@ except ModuleNotFoundError:
 
 from PIL import ImageTk, Image
 
-from .album import ZippedAlbum, create_zipped_album
+from .album import (ZippedAlbum, create_zipped_album, start_render_pool,
+                    shutdown_render_pool)
 from .utils import (safely_import_tkinterdnd2, get_linux_scaling,
                     get_hex_colour, is_venv, get_config_folder, FontBase)
 from .widgets import (AutoScrollbar, ResizingCanvas, CanvasProgressbar,
                       TrackTooltip)
 from .dialogues import AboutDialogue, SettingsDialogue, CreateAlbumDialogue
 from .binaries import has_ffmpeg, download_ffmpeg, get_platform
+from .cache import clear_cached_probe
+from . import profiling
 
 tkinterdnd2 = safely_import_tkinterdnd2()
 
@@ -78,6 +82,9 @@ FONTSIZE_TEMPLATES = {"huge": 1.6,
                      "tiny": 0.7}
 
 UPDATE_INTERVALL = 100  # in ms
+PREVIEW_INTERVALL = 16  # in ms
+AUDIO_ENGINE_INTERVALL = 10  # in ms
+IMAGE_INTERVALL = 16  # in ms
 
 while True:
     h,l,s = [random.random() for x in range(3)]
@@ -149,9 +156,20 @@ class MainApplication(tk.Toplevel):
         self.rowconfigure(0, weight=1)
         #self.create_bindings()
         self.current_image = None
+        self.waiting_image = None
+        self.image_request = 0
+        self.image_executor = concurrent.futures.ThreadPoolExecutor(1)
+        # Tk is not thread-safe, so background threads hand their results
+        # over to the Tk thread through a queue, which is only polled while
+        # results are outstanding
+        self._image_queue = queue.Queue()
+        self._images_outstanding = 0
+        self._poll_images_after_id = None
         self.selected_track_id = None
         self.playing_track_id = None
         self.resize_after_id = None
+        self.preview_after_id = None
+        self.transition_after_id = None
         self.last_update_player = 0
         self.now = time.monotonic
 
@@ -184,37 +202,29 @@ class MainApplication(tk.Toplevel):
         #self.geometry(f"{WIDTH}x{HEIGHT}")
         #self.parent.geometryself._last_geometry)
 
-        self.create_menu()
-
         self.protocol('WM_DELETE_WINDOW', self.quit)
         self.create_bindings()
         self.update()
+        profiling.mark("first window")
 
-        if not has_ffmpeg():
-            time.sleep(0.1)
-            self.handle_ffmpeg_download()
-        try:
-            global AudioPlayer, GaplessAudioPlayer
-            from .player import AudioPlayer, GaplessAudioPlayer
-            if self.audio_system == "":
-                self.audio_system = \
-                    list(AudioPlayer.available_audio_systems.keys())[0]
-
-        except AssertionError as e:
-            messagebox.showerror(title="FFmpeg error",
-                                 message="There was an error loading the "
-                                         "required FFmpeg libraries!\n\n"
-                                         "The application will close now.",
-                                 parent=self)
-            sys.exit()
+        # The audio engine (FFmpeg, pyglet and the audio systems) is
+        # initialized in the background; anything that needs a player waits
+        # for it via `when_audio_engine_ready`
+        self.audio_engine_ready = False
+        self.audio_engine_error = None
+        self._audio_engine_callbacks = []
+        self._audio_engine_queue = queue.Queue()
+        self.start_audio_engine()
 
         self.lift()
         self.focus_force()
 
         def update_player():
             try:
-                if hasattr(self, "player") and self.player.is_playing:
-                    self.player.update()
+                if hasattr(self, "player"):
+                    self.handle_player_events()
+                if hasattr(self, "player") and self.player.is_playing and \
+                        self.transition_after_id is None:
                     now = self.now()
                     if now - self.last_update_player >= 1:
                         track = self.loaded_album.tracklist[
@@ -231,6 +241,92 @@ class MainApplication(tk.Toplevel):
 
         update_player()
 
+    def start_audio_engine(self, check_ffmpeg=True):
+        # On macOS, pyglet must not touch Cocoa outside of the main thread,
+        # so only FFmpeg is looked for in the background there
+        background = platform.system() != "Darwin"
+
+        def init():
+            try:
+                if check_ffmpeg and not has_ffmpeg():
+                    self._audio_engine_queue.put(("no ffmpeg", None))
+                elif check_ffmpeg and not background:
+                    self._audio_engine_queue.put(("ffmpeg found", None))
+                else:
+                    from . import player
+                    if self.audio_system == "":
+                        self.audio_system = player.get_default_audio_system()
+                    else:
+                        player.get_audio_system(self.audio_system)
+                    self._audio_engine_queue.put(("ready", None))
+            except Exception as e:
+                self._audio_engine_queue.put(("error", e))
+
+        if check_ffmpeg or background:
+            threading.Thread(target=init, daemon=True).start()
+        else:
+            self.after_idle(init)
+        self.after(AUDIO_ENGINE_INTERVALL, self.poll_audio_engine)
+
+    def poll_audio_engine(self):
+        try:
+            status, error = self._audio_engine_queue.get_nowait()
+        except queue.Empty:
+            self.after(AUDIO_ENGINE_INTERVALL, self.poll_audio_engine)
+            return
+
+        if status == "no ffmpeg":
+            self.handle_ffmpeg_download()
+            self.start_audio_engine(check_ffmpeg=False)
+        elif status == "ffmpeg found":
+            self.start_audio_engine(check_ffmpeg=False)
+        elif status == "error" and not isinstance(error, AssertionError):
+            # Without an audio engine, albums can still be viewed
+            self.audio_engine_error = error
+            profiling.mark("audio engine failed")
+            self._audio_engine_callbacks = []
+            if self.loaded_album is not None:
+                self.trackinfo["text"] = "Audio not available"
+            messagebox.showerror(title="Audio error",
+                                 message="The audio engine could not be "
+                                         f"initialized:\n\n{error}\n\n"
+                                         "Albums can be viewed, but not "
+                                         "played.",
+                                 parent=self)
+            profiling.report()
+        elif status == "error":
+            clear_cached_probe("has_ffmpeg")
+            messagebox.showerror(title="FFmpeg error",
+                                 message="There was an error loading the "
+                                         "required FFmpeg libraries!\n\n"
+                                         "The application will close now.",
+                                 parent=self)
+            sys.exit()
+        else:
+            global AudioEngine
+            from .player import AudioEngine
+            self.audio_engine_ready = True
+            profiling.mark("audio engine ready")
+            callbacks = self._audio_engine_callbacks
+            self._audio_engine_callbacks = []
+            for callback in callbacks:
+                callback()
+
+    def when_audio_engine_ready(self, callback):
+        """Call a function as soon as the audio engine is ready.
+
+        Parameters
+        ----------
+        callback : callable
+            the function to call (immediately, if the engine is ready)
+
+        """
+
+        if self.audio_engine_ready:
+            callback()
+        else:
+            self._audio_engine_callbacks.append(callback)
+
     @property
     def volume(self):
         return self.volume_slider["value"]
@@ -1057,12 +1153,15 @@ class MainApplication(tk.Toplevel):
         self.volume_slider.bind("<B1-Motion>", set_volume_from_mouseclick)
 
         def clicked_treeitem(e):
-            if str(self.playpause_button["state"]) == "disabled":
+            # During a track transition, another track can still be selected
+            if str(self.playpause_button["state"]) == "disabled" and \
+                    self.transition_after_id is None:
                 return
             item_id = self.tree.identify('item', e.x, e.y)
             if item_id == "":
                 return
-            elif item_id == str(self.selected_track_id):
+            self.cancel_track_transition()
+            if item_id == str(self.selected_track_id):
                 self.playpause()
             else:
                 play = False
@@ -1102,32 +1201,126 @@ class MainApplication(tk.Toplevel):
         self.canvas.itemconfig(self.canvas_left_fg, fill="")
         self.arrows_visible = False
 
-    def wait_cover_image(self, *args):
-        while True:
-            if self.loaded_album.get_slide(0) is not None:
-                self.show_image(0)
-                break
+    def expect_image(self):
+        self._images_outstanding += 1
+        if self._poll_images_after_id is None:
+            self._poll_images_after_id = self.after(IMAGE_INTERVALL,
+                                                    self.poll_images)
 
-    def show_image(self, nr=0):
+    def poll_images(self):
+        self._poll_images_after_id = None
         try:
-            if nr is None:
-                nr = -1
-            if nr == -1:
-                im = Image.open(os.path.abspath(os.path.join(
-            os.path.split(__file__)[0], "no_album.png")))
+            while True:
+                callback = self._image_queue.get_nowait()
+                self._images_outstanding -= 1
+                callback()
+        except queue.Empty:
+            pass
+        if self._images_outstanding > 0 and \
+                self._poll_images_after_id is None:
+            try:
+                self._poll_images_after_id = self.after(IMAGE_INTERVALL,
+                                                        self.poll_images)
+            except tk._tkinter.TclError:
+                pass
+
+    def wait_image(self, nr):
+        album = self.loaded_album
+        self.waiting_image = nr
+
+        def show():
+            if self.loaded_album is album and self.waiting_image == nr:
+                self.show_image(nr)
+
+        def done(future):
+            # Called from another thread; a page that failed to render is not
+            # waited for again right away
+            if not future.cancelled() and future.exception() is None:
+                self._image_queue.put(show)
+            else:
+                self._image_queue.put(lambda: None)
+
+        album.get_slide_future(nr).add_done_callback(done)
+        self.expect_image()
+
+    def show_image(self, nr=0, preview=False):
+        # Decoding and scaling happen in a background thread, only the result
+        # is shown on the Tk thread (unless another image has been requested
+        # in the meantime); a preview is scaled fast from a smaller size
+        self.waiting_image = None
+        if nr is None:
+            nr = -1
+        if nr == -1:
+            self.current_image = None
+        else:
+            self.current_image = nr
+            try:
+                self.loaded_album.focus_slide(nr)
+            except Exception:
+                pass
+        self.image_request += 1
+        request = self.image_request
+        album = self.loaded_album
+        dim = min(self.canvas.width, self.canvas.height)
+        future = self.image_executor.submit(self.prepare_image, request,
+                                            album, nr, dim, preview)
+        self.expect_image()
+        future.add_done_callback(
+            lambda f: self.image_prepared(request, nr, f))
+
+    def image_prepared(self, request, nr, future):
+        # Called from the background thread
+        self._image_queue.put(lambda: self.display_image(request, nr, future))
+
+    def prepare_image(self, request, album, nr, dim, preview=False):
+        if request != self.image_request:
+            return None
+        if nr == -1:
+            im = Image.open(os.path.abspath(os.path.join(
+                os.path.split(__file__)[0], "no_album.png")))
+            nr_of_slides = 0
+        else:
+            if preview:
+                im = album.get_slide_image(nr, size=max(1, dim // 2))
             else:
-                im = Image.open(self.loaded_album.get_slide(nr))
-
-            if im.width != im.height:
-                larger = im.width if im.width > im.height else im.height
-                bg = Image.new('RGBA', (larger, larger), (0, 0, 0, 255))
-                offset = (int(round(((larger - im.width) / 2), 0)),
-                          int(round(((larger - im.height) / 2),0)))
-                bg.paste(im, offset)
-                im = bg
-
-            dim = min(self.canvas.width, self.canvas.height)
-            im = im.resize((dim, dim), Image.LANCZOS)
+                im = album.get_slide_image(nr, size=dim)
+            if im is None:
+                return None
+            elif im is False:  # no such slide
+                return False
+            nr_of_slides = album.nr_of_slides
+
+        # Scale first (with Pillow's reducing fast path for large images),
+        # then pad to square
+        factor = dim / max(im.width, im.height)
+        size = (max(1, int(round(im.width * factor))),
+                max(1, int(round(im.height * factor))))
+        if preview:
+            scaled = im.resize(size, Image.BILINEAR)
+        else:
+            scaled = im.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        if scaled.width != scaled.height:
+            bg = Image.new('RGBA', (dim, dim), (0, 0, 0, 255))
+            offset = (int(round(((dim - scaled.width) / 2), 0)),
+                      int(round(((dim - scaled.height) / 2),0)))
+            bg.paste(scaled, offset)
+            scaled.close()
+            scaled = bg
+        return scaled, nr_of_slides
+
+    def display_image(self, request, nr, future):
+        if request != self.image_request:
+            return
+        try:
+            result = future.result()
+            if result is None:
+                if nr != -1:
+                    self.wait_image(nr)
+                return
+            elif result is False:
+                self.hide_image()
+                return
+            im, nr_of_slides = result
             self.canvas.image = ImageTk.PhotoImage(im)
             im.close()
             try:
@@ -1138,11 +1331,7 @@ class MainApplication(tk.Toplevel):
                 self.canvas.width // 2, self.canvas.height // 2,
                 image=self.canvas.image, anchor="center")
             self.canvas.tag_lower(self.canvas_image)
-            if nr == -1:
-                self.current_image = None
-            else:
-                self.current_image = nr
-            if nr < self.loaded_album.nr_of_slides - 1:
+            if nr < nr_of_slides - 1:
                 self.canvas_arrow_right = True
             else:
                 self.canvas_arrow_right = False
@@ -1176,6 +1365,7 @@ class MainApplication(tk.Toplevel):
             self.show_image(new_image)
 
     def clear(self):
+        self.cancel_track_transition()
         self.track_tooltip.deactivate()
         self.title("ZAP")
         self.hide_image()
@@ -1431,86 +1621,51 @@ class MainApplication(tk.Toplevel):
 
 
     def create_player(self, gapless=False):
+        if getattr(self, "player", None) is not None:
+            self.player.close()
+        self.player = AudioEngine(gapless,
+                                  self.audio_system,
+                                  self.sample_format,
+                                  self.sample_rate,
+                                  self.channel_mode,
+                                  self.hq_resampling)
         if gapless:
-            self.player = GaplessAudioPlayer(self.audio_system,
-                                             self.sample_format,
-                                             self.sample_rate,
-                                             self.channel_mode,
-                                             self.hq_resampling)
+            self.player.set_stream_format(*self.get_stream_format())
 
-        else:
-            self.player = AudioPlayer(self.audio_system,
-                                      self.sample_format,
-                                      self.sample_rate,
-                                      self.channel_mode,
-                                      self.hq_resampling)
-
-        def next_gapless():
+        def next_gapless(event_time):
+            # The gapless player reports when playback reached the next track
             if self.selected_track_id + 1 < len(self.loaded_album.tracklist):
-                self.playpause_button["state"] = "disabled"
-                track = self.loaded_album.tracklist[self.selected_track_id]
-                dur = track["streaminfo"]["duration"]
-                tickspeed = UPDATE_INTERVALL / 1000
-                pos = self.playhead / 100 * dur + tickspeed
-                start = self.now()
-                buffer_time = self.player.buffer_time
-                # Update GUI after running out of audio data
-                while True:
-                    current_time = self.now()
-                    if buffer_time is None:
-                        break
-                    max_time = min(dur - (pos - tickspeed), 2 * buffer_time)
-                    if current_time - start >= max_time:
-                        break
-                    self.playhead = 100 / dur * (pos + self.now() - start)
-                    self.update()
-                    sleep_time = tickspeed - (self.now() - current_time)
-                    if sleep_time > 0:
-                        time.sleep(sleep_time)
-                self.playpause_button["state"] = "normal"
-                tags = self.tree.item(str(self.selected_track_id), "tags")
-                tags = [x for x in tags if x != "bold"]
-                tags.append("normal")
-                self.tree.item(str(self.selected_track_id), tags=tags)
-                track_id = self.selected_track_id + 1
-                tags = self.tree.item(str(track_id), "tags")
-                tags = [x for x in tags if x != "normal"]
-                tags.append("bold")
-                self.tree.selection_set([str(track_id)])
-                self.tree.focus(str(track_id))
-                self.tree.see(str(track_id))
-                self.tree.item(str(track_id), tags=tags)
-                try:
-                    self.player.queue(self.loaded_album.get_audio(track_id + 1))
-                except Exception:
-                    pass
-                self.selected_track_id = track_id
-                self.playing_track_id = track_id
-                self.load_track()
-                self.set_title()
+                show_next_gapless()
+
+        def show_next_gapless():
+            tags = self.tree.item(str(self.selected_track_id), "tags")
+            tags = [x for x in tags if x != "bold"]
+            tags.append("normal")
+            self.tree.item(str(self.selected_track_id), tags=tags)
+            track_id = self.selected_track_id + 1
+            tags = self.tree.item(str(track_id), "tags")
+            tags = [x for x in tags if x != "normal"]
+            tags.append("bold")
+            self.tree.selection_set([str(track_id)])
+            self.tree.focus(str(track_id))
+            self.tree.see(str(track_id))
+            self.tree.item(str(track_id), tags=tags)
+            try:
+                self.player.queue(self.loaded_album.get_audio(track_id + 1))
+            except Exception:
+                pass
+            self.selected_track_id = track_id
+            self.playing_track_id = track_id
+            self.load_track()
+            self.set_title()
 
-        def next():
-            self.playpause_button["state"] = "disabled"
-            track = self.loaded_album.tracklist[self.selected_track_id]
-            dur = track["streaminfo"]["duration"]
-            tickspeed = UPDATE_INTERVALL / 1000
-            pos = self.playhead / 100 * dur + tickspeed
-            start = self.now()
-            buffer_time = self.player.buffer_time
-            # Update playhead after running out of audio data
-            while True:
-                current_time = self.now()
-                if buffer_time is None:
-                    break
-                max_time = min(dur - (pos - tickspeed), 2 * buffer_time)
-                if current_time - start >= max_time:
-                    break
-                self.playhead = 100 / dur * (pos + self.now() - start)
-                self.update()
-                sleep_time = tickspeed - (self.now() - current_time)
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-            self.playpause_button["state"] = "normal"
+        def next(event_time):
+            if self.player.gapless:
+                play_next()
+            else:
+                self.finish_track(play_next, event_time)
+
+        def play_next():
             if self.selected_track_id + 1 < len(self.loaded_album.tracklist):
                 tags = self.tree.item(str(self.selected_track_id), "tags")
                 tags = [x for x in tags if x != "bold"]
@@ -1548,8 +1703,105 @@ class MainApplication(tk.Toplevel):
                 if self.repeat_album.get():
                     self.play()
 
-        self.player.eos_callback = next
-        self.player.eos_gapless_callback = next_gapless
+        self.player_event_handlers = {"eos": next,
+                                      "gapless_eos": next_gapless}
+
+    def get_stream_format(self):
+        """Return the common output format for gapless playback.
+
+        Returns
+        -------
+        stream_format : tuple or None
+            the highest sample rate, number of channels (at most 2) and
+            number of bits per decoded sample (0 if not known) of all tracks
+            (None if sample rate or channels are not known for all tracks)
+
+        """
+
+        sample_rates = []
+        channels = []
+        sample_bits = [0]
+        for track in self.loaded_album.tracklist:
+            try:
+                sample_rates.append(int(track["streaminfo"]["sample_rate"]))
+                channels.append(min(2, int(track["streaminfo"]["channels"])))
+            except Exception:
+                return None
+            if track.get("codec") == "Opus":
+                sample_bits.append(32)  # decoded as float
+            elif "bit_depth" in track["streaminfo"]:
+                # FLAC with more than 16 bits is decoded into 32 bits
+                bits = int(track["streaminfo"]["bit_depth"])
+                sample_bits.append(32 if bits > 16 else bits)
+        if not sample_rates or 0 in sample_rates or 0 in channels:
+            return None
+        return max(sample_rates), max(channels), max(sample_bits)
+
+    def finish_track(self, callback, start=None):
+        """Let the buffered audio of the current track play out.
+
+        The playhead keeps moving until the audio data that is still
+        buffered has been played, and then the callback is called. This is
+        driven by `after` timers, so that the GUI never blocks.
+
+        Parameters
+        ----------
+        callback : callable
+            the function to call when the track has finished
+        start : float, optional
+            the (monotonic) time the audio engine ran out of audio data
+            (default: now)
+
+        """
+
+        if self.transition_after_id is not None:
+            return
+        self.playpause_button["state"] = "disabled"
+        track = self.loaded_album.tracklist[self.selected_track_id]
+        dur = track["streaminfo"]["duration"]
+        tickspeed = UPDATE_INTERVALL / 1000
+        pos = self.playhead / 100 * dur + tickspeed
+        if start is None:
+            start = self.now()
+        buffer_time = self.player.buffer_time
+        if buffer_time is None:
+            max_time = 0
+        else:
+            max_time = min(dur - (pos - tickspeed), 2 * buffer_time)
+
+        def update():
+            elapsed = self.now() - start
+            if elapsed >= max_time:
+                self.transition_after_id = None
+                self.playpause_button["state"] = "normal"
+                callback()
+            else:
+                self.playhead = 100 / dur * (pos + elapsed)
+                delay = min(UPDATE_INTERVALL,
+                            int((max_time - elapsed) * 1000) + 1)
+                self.transition_after_id = self.after(delay, update)
+
+        update()
+
+    def handle_player_events(self):
+        # Events are handled one after another, each after the track
+        # transition of the previous one has finished
+        while self.transition_after_id is None:
+            try:
+                event, event_time, generation = \
+                    self.player.events.get_nowait()
+            except queue.Empty:
+                break
+            # Events from before the last command (e.g. the end of a track
+            # that has been replaced in the meantime) are outdated
+            if generation == self.player.generation:
+                self.player_event_handlers[event](event_time)
+
+    def cancel_track_transition(self):
+        if self.transition_after_id is not None:
+            self.after_cancel(self.transition_after_id)
+            self.transition_after_id = None
+            self.playpause_button["state"] = "normal"
 
     def load_album(self, path, exact=False):
         try:
@@ -1563,7 +1815,7 @@ class MainApplication(tk.Toplevel):
                 parent=self.master)
             return
 
-        self.loaded_album.prepare_booklet_pages(self.wait_cover_image)
+        self.loaded_album.prepare_booklet_pages()
         self.show_image()
         self.track["text"] = self.loaded_album.title
         self.artist["text"] = self.loaded_album.artist
@@ -1616,9 +1868,20 @@ class MainApplication(tk.Toplevel):
 
         print(f"Loaded album: {path}")
 
-        gapless = len(set([type(x) for x in self.loaded_album.tracklist])) == 1
-        self.create_player(gapless)
-        self.load_track()
+        gapless = self.get_stream_format() is not None
+        album = self.loaded_album
+
+        def attach_player():
+            if self.loaded_album is album:
+                self.create_player(gapless)
+                self.load_track()
+                profiling.mark("album playable")
+
+        if self.audio_engine_error is not None:
+            self.trackinfo["text"] = "Audio not available"
+        elif not self.audio_engine_ready:
+            self.trackinfo["text"] = "Initializing audio..."
+        self.when_audio_engine_ready(attach_player)
         self.track_tooltip.album = self.loaded_album
 
         self.truncate_titles()
@@ -1628,6 +1891,7 @@ class MainApplication(tk.Toplevel):
     def make_album(self, directory, filename=None, png=False, load=True,
                    exact=False):
         # Clear current state
+        self.cancel_track_transition()
         self.title("ZAP")
         self.hide_image()
         self.show_image(-1)
@@ -1758,6 +2022,7 @@ class MainApplication(tk.Toplevel):
             f"{codec_str}{bitrate_str}{samplerate_str}{bitdepth_str}{channels}"
 
     def play(self):
+        self.cancel_track_transition()
         preload_track = False
         tags = self.tree.item(str(self.selected_track_id), "tags")
         tags = [x for x in tags if x != "normal"]
@@ -1774,7 +2039,7 @@ class MainApplication(tk.Toplevel):
             track = self.loaded_album.tracklist[self.selected_track_id]
             pos = track["streaminfo"]["duration"] / 100 * self.playhead
             self.player.seek(pos)
-            if isinstance(self.player, GaplessAudioPlayer):
+            if self.player.gapless:
                 preload_track = True
         self.truncate_titles()
         if preload_track:
@@ -1810,7 +2075,8 @@ class MainApplication(tk.Toplevel):
                 selected_track_id = 0
             elif selected_track_id >= len(self.loaded_album.tracklist):
                 selected_track_id = len(self.loaded_album.tracklist) - 1
-            if str(self.playpause_button["state"]) == "disabled":
+            if str(self.playpause_button["state"]) == "disabled" and \
+                    self.transition_after_id is None:
                 return
             play_next = False
             if self.playing_track_id is not None:
@@ -1819,6 +2085,7 @@ class MainApplication(tk.Toplevel):
                 self._last_increment_track = self.now()
                 self.pause()
                 play_next = True
+            self.cancel_track_transition()
             self.tree.selection_set([str(selected_track_id)])
             self.tree.focus(str(selected_track_id))
             self.tree.see(str(selected_track_id))
@@ -1852,11 +2119,20 @@ class MainApplication(tk.Toplevel):
 
     def schedule_resize(self, event):
         if not (self.size == [event.width, event.height]):
+            # Show fast previews while resizing (at most one per frame), and
+            # the final image once the size does not change anymore
+            if not self.preview_after_id:
+                self.preview_after_id = self.after(PREVIEW_INTERVALL,
+                                                   self.resize_preview)
             if self.resize_after_id:
                 self.after_cancel(self.resize_after_id)
             self.resize_after_id = self.after(100, self.resize)
 
-    def resize(self, size=None):
+    def resize_preview(self):
+        self.preview_after_id = None
+        self.resize(preview=True)
+
+    def resize(self, size=None, preview=False):
         if size:
             width = size[0]
             height = size[1]
@@ -1865,7 +2141,10 @@ class MainApplication(tk.Toplevel):
             width, height = [int(x) for x in size.split("x")]
         self.canvas["width"] = height
         self.canvas["height"] = height
-        self.size = [width, height]
+        # Only a final resize settles the size, so that a preview does not
+        # keep the last resize event from scheduling it
+        if not preview:
+            self.size = [width, height]
         #self.canvas.frame_coords(self.canvas_left_bg, 50, height/2, 20)
         #self.canvas.frame_coords(self.canvas_right_bg, height-50, height/2, 20)
         #self.canvas.coords(self.canvas_left_fg, 50, height/2)
@@ -1875,7 +2154,7 @@ class MainApplication(tk.Toplevel):
             current_image = None
         else:
             current_image = self.current_image
-        self.show_image(current_image)
+        self.show_image(current_image, preview=preview)
 
     def set_view_preset(self, preset="default", event=None):
         global HEIGHT
@@ -2051,14 +2330,15 @@ class MainApplication(tk.Toplevel):
         self.config_parser.set(section_name, key, value)
 
     def restart_player(self):
-        if self.loaded_album:
-            gapless = isinstance(self.player, GaplessAudioPlayer)
+        if self.loaded_album and hasattr(self, "player"):
+            gapless = self.player.gapless
             was_playing = False
             if self.player.is_playing:
                 start = time.perf_counter()
                 self.player.pause()
                 pause_time = self.player.time
                 was_playing = True
+            self.player.close()
             del self.player
             self.create_player(gapless=gapless)
             self.load_track()
@@ -2077,14 +2357,15 @@ class MainApplication(tk.Toplevel):
         #                                                     state="disabled")
         #        if output_format == self.output_format.get():
         #            self.output_format.set("Automatic")
-        if self.loaded_album:
-            gapless = isinstance(self.player, GaplessAudioPlayer)
+        if self.loaded_album and hasattr(self, "player"):
+            gapless = self.player.gapless
             was_playing = False
             if self.player.is_playing:
                 start = time.perf_counter()
                 self.player.pause()
                 pause_time = self.player.time
                 was_playing = True
+            self.player.close()
             del self.player
             self.create_player(gapless=gapless)
             self.load_track()
@@ -2097,14 +2378,15 @@ class MainApplication(tk.Toplevel):
                               self.audio_system.get())
 
     def set_sample_format(self, event=None):
-        if self.loaded_album:
-            gapless = isinstance(self.player, GaplessAudioPlayer)
+        if self.loaded_album and hasattr(self, "player"):
+            gapless = self.player.gapless
             was_playing = False
             if self.player.is_playing:
                 start = time.perf_counter()
                 self.player.pause()
                 pause_time = self.player.time
                 was_playing = True
+            self.player.close()
             del self.player
             self.create_player(gapless=gapless)
             if was_playing:
@@ -2116,14 +2398,15 @@ class MainApplication(tk.Toplevel):
                               self.sample_format.get())
 
     def set_sample_rate(self, event=None):
-        if self.loaded_album:
-            gapless = isinstance(self.player, GaplessAudioPlayer)
+        if self.loaded_album and hasattr(self, "player"):
+            gapless = self.player.gapless
             was_playing = False
             if self.player.is_playing:
                 start = time.perf_counter()
                 self.player.pause()
                 pause_time = self.player.time
                 was_playing = True
+            self.player.close()
             del self.player
             self.create_player(gapless=gapless)
             if was_playing:
@@ -2162,7 +2445,14 @@ class MainApplication(tk.Toplevel):
         #    geometry = self.parent.geometry()
         #self.config_parser.set("GENERAL", "window_geometry", geometry)
         self.write_config()
+        if getattr(self, "player", None) is not None:
+            self.player.close()
         self.player = None
+        try:
+            self.image_executor.shutdown(wait=False, cancel_futures=True)
+        except TypeError:  # Python < 3.9
+            self.image_executor.shutdown(wait=False)
+        shutdown_render_pool()
         self.parent.destroy()
 
 
@@ -2214,6 +2504,9 @@ def run():
 
     root.withdraw()
     app = MainApplication(root)
+    root.after_idle(start_render_pool)
+    if profiling.is_active():
+        profiling.mark("initialized")
 
     try:
         if "--exact" in sys.argv:
@@ -2240,6 +2533,10 @@ def run():
     except Exception:
         pass
 
+    # Reported after an album given on the command line has been attached
+    if profiling.is_active():
+        app.when_audio_engine_ready(profiling.report)
+
     root.mainloop()
 
 